@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Headless batch mode: runs the same worker pool as the GUI and writes the results
+to files instead of tabs.
+
+    python batch.py --boxes all --date 2015_01_01 --duration 7 --out results/
+
+For each box, <box>.npz holds the histogram of every event at the chosen bin
+size, counts_<n> and edges_<n> for its n-th event (rates() makes each event's
+histograms with edges of its own), and their dates. events.csv lists the events of all boxes,
+summary.csv has one row per box and day and coincidences.csv lists the events
+seen by several boxes of one region within --window ms. metrics.jsonl has the
+timings of every box and day, see metrics.py. Every analysed day is also added
+to the day index in info/index/ that the GUI's overview shows. Defaults for the path, worker count,
+cache size and reader come from info/config.txt, as in the GUI.
+
+Nothing here may import Qt or matplotlib, so it starts fast and runs without a
+display.
+"""
+
+import sys
+import os
+from os import path, getcwd
+import argparse
+import multiprocessing as mp
+import csv
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+import numpy as np
+
+from workers import WorkerPool, split_days, READERS, RATES
+from summary import BIN, FINE_BIN
+from cache import ResultCache
+from metrics import RunMetrics
+from rawdata import day_bytes
+from dayindex import DayIndex, index_file
+from stations import BOXES, REGION_OF
+from coincidence import day_offsets, region_ids, find_groups
+from events import timed
+
+
+BIN_SIZES = {'2ms': 0.002, '20us': 0.00002}
+
+
+def read_config(filename):
+    """returns the 'key: value' lines of the config file as a dict"""
+    config = {}
+    if not path.isfile(filename):
+        return config
+    with open(filename, 'r') as f:
+        for line in f:
+            if ': ' in line:
+                key, value = line.split(': ', 1)
+                config[key.strip()] = value.strip()
+    return config
+
+
+def bin_size(text):
+    """parses '2ms', '20us' or a bin width in seconds"""
+    if text in BIN_SIZES:
+        return BIN_SIZES[text]
+    return float(text)
+
+
+def parse_args(argv):
+    config = read_config(path.join(getcwd(), 'info', 'config.txt'))
+    parser = argparse.ArgumentParser(description='Tetra-II batch analysis')
+    parser.add_argument('--boxes', nargs='+', default=['all'],
+                        help="box names, or 'all' for the whole array")
+    parser.add_argument('--date', default=config.get('date', '2015_01_01'),
+                        help='start date, YYYY_MM_DD')
+    parser.add_argument('--duration', type=int, default=1, help='number of days')
+    parser.add_argument('--threshold', type=float, default=30, help='threshold in sigma')
+    parser.add_argument('--path', default=config.get('path', 'C:/tetra2/array/'),
+                        help='path to the array data')
+    parser.add_argument('--bins', type=bin_size, default=0.002,
+                        help="histogram bin size: '2ms', '20us' or seconds")
+    parser.add_argument('--window', type=float, default=float(config.get('coincidence', 4)),
+                        help='coincidence window in ms')
+    parser.add_argument('--out', default='results', help='output directory')
+    parser.add_argument('--workers', type=int, default=int(config.get('workers', 0)) or None,
+                        help='number of worker processes, defaults to the core count')
+    parser.add_argument('--cache', type=int, default=int(config.get('cache', 500)),
+                        help='result cache size in MB, 0 turns it off')
+    parser.add_argument('--reader', choices=READERS, default=config.get('reader', READERS[0]),
+                        help="'rates' for plot_hists_gui3.rates(), 'times' for raw files of count times")
+    parser.add_argument('--profile', default=None,
+                        help='directory to save a cProfile profile of every box and day in')
+    args = parser.parse_args(argv)
+    if args.reader == RATES and args.bins not in (BIN, FINE_BIN):
+        #rates() events have no raw times to bin at other widths
+        parser.error("the rates reader only has '2ms' and '20us' histograms")
+    if args.boxes == ['all']:
+        args.boxes = BOXES
+    return args
+
+
+def run(args):
+    """runs every (box, day) of args on a WorkerPool, returns {box: [(summary, errors)]}"""
+    days = split_days(args.date, args.duration)
+    cache = None
+    if args.cache > 0:
+        cache = ResultCache(path.join(getcwd(), 'info', 'cache'), args.cache * 2**20)
+    if args.profile and not path.isdir(args.profile):
+        os.makedirs(args.profile)
+    if not path.isdir(args.out):
+        os.makedirs(args.out)
+    pool = WorkerPool(args.workers, cache, profile=args.profile, reader=args.reader)
+    metrics = RunMetrics(path.join(args.out, 'metrics.jsonl'), boxes=args.boxes, days=days,
+                         path=args.path, workers=pool.size, spawn=pool.spawn)
+    index = DayIndex(index_file(path.join(getcwd(), 'info', 'index'), args.path))
+    done = Queue()
+    results = dict((box, [None for day in days]) for box in args.boxes)
+    try:
+        #units with the most raw data first, so the last ones to finish are short
+        for box in args.boxes:
+            for n, (day, size) in enumerate(zip(days, day_bytes(args.path, box, days))):
+                pool.submit((box, day, args.path, 0, args.threshold),
+                            lambda summary, errors, box=box, n=n: done.put((box, n, summary, errors)),
+                            priority=-size)
+        for x in range(len(args.boxes) * len(days)):
+            box, n, summary, errors = done.get()
+            if summary != -1:
+                index.update(summary)
+                if summary.stats is not None:
+                    metrics.unit(box, days[n], summary.stats)
+            results[box][n] = summary, errors
+    finally:
+        pool.close()
+        metrics.close()
+        index.save()
+    return results
+
+
+def write(args, results):
+    """writes the per-box histograms, events.csv and summary.csv to args.out"""
+    if not path.isdir(args.out):
+        os.makedirs(args.out)
+    days = split_days(args.date, args.duration)
+    with open(path.join(args.out, 'events.csv'), 'w') as ev_file, \
+         open(path.join(args.out, 'summary.csv'), 'w') as sum_file:
+        events_csv = csv.writer(ev_file, lineterminator='\n')
+        summary_csv = csv.writer(sum_file, lineterminator='\n')
+        events_csv.writerow(['box', 'date', 'sigma', 'avg', 'min'])
+        summary_csv.writerow(['box', 'day', 'events', 'mean_rate', 'errors'])
+        for box in args.boxes:
+            hists = {}
+            dates = []
+            for day, (summary, errors) in zip(days, results[box]):
+                errors = ' | '.join(str(x) for x in errors)
+                if summary == -1:
+                    summary_csv.writerow([box, day, '', '', errors])
+                    continue
+                events = summary.select(args.threshold)
+                seconds = max(summary.done - summary.start, 1.0)
+                #rates() summaries have no blocks to take the mean rate of
+                rate = '%.3f' % (summary.counts.sum() / seconds) if len(summary.counts) else ''
+                summary_csv.writerow([box, day, len(events), rate, errors])
+                for event in events:
+                    hist = event.histogram(args.bins)
+                    hists['counts_%d' % len(dates)] = hist[0]
+                    hists['edges_%d' % len(dates)] = hist[1]
+                    dates.append(event.date)
+                    events_csv.writerow([box, event.date, '%.2f' % event.sigma,
+                                         '%.3f' % event.avg, event.minimum])
+            if dates:
+                np.savez_compressed(path.join(args.out, box + '.npz'), dates=np.array(dates),
+                                    bins=args.bins, **hists)
+    write_coincidences(args, results, days)
+
+
+def write_coincidences(args, results, days):
+    """writes coincidences.csv, one row per event of each coincident group"""
+    offsets = day_offsets(days)
+    regions = region_ids(args.boxes)
+    events = []
+    for b, box in enumerate(args.boxes):
+        for n, (summary, errors) in enumerate(results[box]):
+            if summary != -1:
+                events.extend((offsets[n] + e.t0, b, e) for e in summary.select(args.threshold)
+                              if timed(e.t0))
+    times = [t for t, b, e in events]
+    boxes = [b for t, b, e in events]
+    groups = find_groups(times, boxes, regions[boxes], args.window / 1000)
+    with open(path.join(args.out, 'coincidences.csv'), 'w') as f:
+        out = csv.writer(f, lineterminator='\n')
+        out.writerow(['group', 'region', 'box', 'date', 'sigma'])
+        for g, group in enumerate(groups):
+            for i in group:
+                t, b, e = events[i]
+                box = args.boxes[b]
+                out.writerow([g + 1, REGION_OF.get(box, ''), box, e.date, '%.2f' % e.sigma])
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    write(args, run(args))
+
+
+if __name__ == '__main__':
+    mp.freeze_support()
+    main()
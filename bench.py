@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the analysis and drawing paths on synthetic data.
+
+    python bench.py --boxes 1 4 --days 1 3 --thresholds 10 30 --out bench.json
+
+Synthetic dev1/dev2 files of flat count times, the layout the 'times' reader
+reads (see rawdata.py), are written for the largest box count and duration,
+each device a Poisson background at --rate counts per second with --bursts
+short bursts a day injected at the same times in both devices. Every
+combination of box count and duration is then timed stage by stage:
+
+    read_first  opening the raw files and reading them whole, building the time indexes
+    read        the same again with the indexes in place
+    rates       the times reader's summary pass of every box and day, in this process
+                (plot_hists_gui3.rates(), the default reader, isn't timed here)
+    pool        the same through a WorkerPool of --workers processes, cache off
+    transfer    packing and unpacking the summaries through buffer files
+    hist_2ms, hist_20us     building the histogram of every event over threshold at each bin size
+    draw_2ms, draw_20us     drawing up to --draws events at each bin size on an Agg canvas
+
+The histogram and draw stages are repeated for each threshold. Before any
+timing, check_boundaries makes sure bursts placed on chunk boundaries and on a
+Watch resume point are each found once (--check runs only that, exiting 1 if
+not). Start up is timed first, once:
+
+    startup_analysis    a fresh interpreter importing analysis.py, as spawned workers do
+    startup_engine      the same for workers.py, all a worker needs
+    startup_gui         the same for gui.py, the window's imports (skipped without PySide)
+    startup_pool        starting a WorkerPool until its first result comes back
+
+Each import stage also lists the heavy modules (Qt, matplotlib) the import
+loaded, which must stay empty for the first two. --startup times only these.
+
+Results go to
+--out as JSON, with the machine, library versions, trigger backend and commit
+they were measured with, so runs of two versions can be compared.
+
+Like batch.py this runs without Qt or a display.
+"""
+
+import sys
+import os
+from os import path
+import argparse
+import multiprocessing as mp
+import platform
+import subprocess
+import tempfile
+import shutil
+import json
+from glob import glob
+from time import time, strftime, gmtime
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+import numpy as np
+
+import trigger
+from workers import WorkerPool, split_days, TIMES
+from rawdata import TIME_DTYPE, INDEX_SUFFIX, day_files, DayData
+from summary import summarize, DAY, SPAN, CHUNK
+from sharedbuf import pack, unpack
+from events import EventTable, bin_times
+from stations import BOXES, REGION_OF
+
+
+WIDTHS = (('2ms', 0.002), ('20us', 0.00002))
+STARTUP = (('analysis', 'analysis'), ('engine', 'workers'), ('gui', 'gui'))
+HEAVY = ('PySide', 'PyQt4', 'PyQt5', 'matplotlib')
+RESUME = 1250                   #seconds, where check_boundaries() splits its day
+BOUNDARY_STOP = 4 * CHUNK
+BOUNDARY_BURSTS = (CHUNK - 0.003, 2 * CHUNK, RESUME - 0.001, 3 * CHUNK - 0.001)
+
+
+def make_data(directory, boxes, days, rate, bursts, seed=0, at=None, spread=0.0003):
+    """writes synthetic raw files of boxes for days under directory, returns the burst times
+
+    Files are laid out as directory/<region>/<box>/<dev>/<day>.dat. Each burst is
+    30 extra counts a device, spread over about spread seconds from the same time
+    in both devices, the times are the same for every box. at, if given, are the
+    burst times instead of bursts random ones.
+    """
+    rng = np.random.RandomState(seed)
+    times = np.sort(rng.uniform(60, DAY - 60, bursts) if at is None else np.asarray(at))
+    for box in boxes:
+        region = REGION_OF.get(box, 'other').lower().replace(' ', '_')
+        for dev in ('dev1', 'dev2'):
+            dev_dir = path.join(directory, region, box, dev)
+            if not path.isdir(dev_dir):
+                os.makedirs(dev_dir)
+            for day in days:
+                counts = [rng.uniform(0, DAY, rng.poisson(rate * DAY))]
+                counts.extend(t + rng.exponential(spread, 30) for t in times)
+                data = np.concatenate(counts).astype(TIME_DTYPE)
+                data.sort()
+                data.tofile(path.join(dev_dir, day + '.dat'))
+    return times
+
+
+def check_boundaries(directory, date, rate, seed=0):
+    """returns the bursts on chunk and resume boundaries that didn't come out as exactly one event
+
+    Each of BOUNDARY_BURSTS must be found once, whether its day is summarized in
+    one pass or in two split at RESUME, as Watch does. The bursts last a few 2 ms
+    bins, so they are over the floor on both sides of their boundary.
+    """
+    make_data(directory, BOXES[:1], [date], rate, 0, seed, at=BOUNDARY_BURSTS, spread=0.003)
+    data = DayData(day_files(directory, BOXES[0], date))
+    whole = summarize(BOXES[0], date, data, stop=BOUNDARY_STOP).events
+    split = (summarize(BOXES[0], date, data, stop=RESUME).events +
+             summarize(BOXES[0], date, data, stop=BOUNDARY_STOP, start=RESUME).events)
+    wrong = []
+    for events in (whole, split):
+        t0 = np.array([e.t0 for e in events])
+        found = [np.sum(np.abs(t0 - t) < 0.01) for t in BOUNDARY_BURSTS]
+        wrong.extend(t for t, k in zip(BOUNDARY_BURSTS, found) if k != 1)
+        if sum(found) != len(events):
+            wrong.extend(float(t) for t in t0)
+    return sorted(set(wrong))
+
+
+def timed(results, stage, units, func, *args):
+    """runs func(*args), appends its timing to results and returns its value"""
+    start = time()
+    value = func(*args)
+    seconds = time() - start
+    results.append({'stage': stage, 'seconds': seconds, 'units': units,
+                    'per_unit': seconds / units if units else None})
+    sys.stderr.write('  %-16s %8.3f s\n' % (stage, seconds))
+    return value
+
+
+def import_time(module):
+    """returns the seconds a fresh interpreter takes to import module and the HEAVY modules it
+    loaded, (None, None) if it can't be imported"""
+    code = ('import sys, time\n'
+            't = time.time()\n'
+            'import %s\n'
+            'print(time.time() - t)\n'
+            'print(" ".join(sorted(set(m.split(".")[0] for m in sys.modules) & set(%r))))'
+            % (module, HEAVY))
+    try:
+        out = subprocess.check_output([sys.executable, '-c', code], stderr=subprocess.STDOUT,
+                                      cwd=path.dirname(path.abspath(__file__)))
+    except subprocess.CalledProcessError:
+        return None, None
+    lines = out.decode().splitlines()
+    return float(lines[-2]), lines[-1].split()
+
+
+def startup_all(workers, date):
+    """returns the start up stages, see the module docstring"""
+    results = []
+    for name, module in STARTUP:
+        seconds, heavy = import_time(module)
+        results.append({'stage': 'startup_' + name, 'seconds': seconds, 'units': 1,
+                        'per_unit': seconds, 'heavy': heavy})
+        if seconds is None:
+            sys.stderr.write('  %-16s skipped, %s does not import here\n' % ('startup_' + name, module))
+        else:
+            sys.stderr.write('  %-16s %8.3f s  %s\n' % ('startup_' + name, seconds, ' '.join(heavy)))
+    #the last block of a day on an empty directory comes back as soon as a worker is up
+    empty = tempfile.mkdtemp(prefix='tetra_bench_empty_')
+    try:
+        start = time()
+        pool = WorkerPool(workers, reader=TIMES)
+        done = Queue()
+        try:
+            pool.submit((BOXES[0], date, empty, DAY - SPAN), lambda summary, errors: done.put(summary))
+            done.get()
+            seconds = time() - start
+            results.append({'stage': 'startup_pool', 'seconds': seconds, 'units': pool.size,
+                            'per_unit': seconds / pool.size, 'spawn': pool.spawn})
+            sys.stderr.write('  %-16s %8.3f s\n' % ('startup_pool', seconds))
+        finally:
+            pool.close()
+    finally:
+        shutil.rmtree(empty, ignore_errors=True)
+    for row in results:
+        row.update({'boxes': None, 'days': None, 'threshold': None})
+    return results
+
+
+def read_all(data_dir, boxes, days):
+    for box in boxes:
+        for day in days:
+            DayData(day_files(data_dir, box, day)).window(-np.inf, np.inf)
+
+
+def rates_all(data_dir, boxes, days):
+    return [summarize(box, day, DayData(day_files(data_dir, box, day)))
+            for box in boxes for day in days]
+
+
+def pool_all(data_dir, boxes, days, workers):
+    pool = WorkerPool(workers, reader=TIMES)
+    done = Queue()
+    try:
+        for box in boxes:
+            for day in days:
+                pool.submit((box, day, data_dir), lambda summary, errors: done.put(summary))
+        return [done.get() for x in range(len(boxes) * len(days))]
+    finally:
+        pool.close()
+
+
+def transfer_all(summaries, directory):
+    return [unpack(pack(s, directory, str(n))) for n, s in enumerate(summaries)]
+
+
+def hist_all(table, rows, width):
+    for i in rows:
+        bin_times(table.times(i), width)
+
+
+def draw_all(table, rows, width):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from render import HistogramPlot
+    fig = Figure(figsize=(8, 6), dpi=72)
+    canvas = FigureCanvasAgg(fig)
+    artists = HistogramPlot(fig.add_subplot(111))
+    for i in rows:
+        artists.plot(table.histogram(i, width), width)
+        canvas.draw()
+
+
+def check(args):
+    """runs check_boundaries() on synthetic data of its own, returns the bursts it got wrong"""
+    data_dir = tempfile.mkdtemp(prefix='tetra_bench_check_')
+    try:
+        wrong = check_boundaries(data_dir, args.date, args.rate, args.seed)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    sys.stderr.write('  %-16s %s\n' % ('check_boundaries',
+                                        'ok' if not wrong else 'wrong at %s' % wrong))
+    return wrong
+
+
+def run(args):
+    """runs every combination of args, returns the JSON ready report"""
+    sys.stderr.write('checks\n')
+    results = [{'stage': 'check_boundaries', 'wrong': check(args), 'boxes': None, 'days': None,
+                'threshold': None}]
+    sys.stderr.write('start up\n')
+    results.extend(startup_all(args.workers, args.date))
+    if args.startup:
+        return report(args, results)
+    data_dir = args.data or tempfile.mkdtemp(prefix='tetra_bench_')
+    buffers = tempfile.mkdtemp(prefix='tetra_bench_buffers_')
+    all_days = split_days(args.date, max(args.days))
+    all_boxes = BOXES[:max(args.boxes)]
+    try:
+        sys.stderr.write('writing %d box-days of synthetic data to %s\n' %
+                         (len(all_boxes) * len(all_days), data_dir))
+        make_data(data_dir, all_boxes, all_days, args.rate, args.bursts, args.seed)
+        for nboxes in args.boxes:
+            for ndays in args.days:
+                boxes = all_boxes[:nboxes]
+                days = all_days[:ndays]
+                units = nboxes * ndays
+                sys.stderr.write('%d boxes, %d days\n' % (nboxes, ndays))
+                for f in glob(path.join(data_dir, '*', '*', '*', '*' + INDEX_SUFFIX)):
+                    os.remove(f)
+                stages = []
+                timed(stages, 'read_first', units, read_all, data_dir, boxes, days)
+                timed(stages, 'read', units, read_all, data_dir, boxes, days)
+                summaries = timed(stages, 'rates', units, rates_all, data_dir, boxes, days)
+                timed(stages, 'pool', units, pool_all, data_dir, boxes, days, args.workers)
+                unpacked = timed(stages, 'transfer', units, transfer_all, summaries, buffers)
+                for row in stages:
+                    row.update({'boxes': nboxes, 'days': ndays, 'threshold': None})
+                results.extend(stages)
+                for threshold in args.thresholds:
+                    table = EventTable(days, threshold)
+                    for s in unpacked:
+                        table.add(boxes.index(s.name), days.index(s.day), s.events, s.times, s.spans)
+                    rows = np.concatenate([table.rows(b) for b in range(nboxes)])
+                    sys.stderr.write(' threshold %g: %d events\n' % (threshold, len(rows)))
+                    stages = []
+                    for name, width in WIDTHS:
+                        timed(stages, 'hist_' + name, len(rows), hist_all, table, rows, width)
+                    for name, width in WIDTHS:
+                        timed(stages, 'draw_' + name, min(len(rows), args.draws),
+                              draw_all, table, rows[:args.draws], width)
+                    for row in stages:
+                        row.update({'boxes': nboxes, 'days': ndays, 'threshold': threshold,
+                                    'events': len(rows)})
+                    results.extend(stages)
+    finally:
+        shutil.rmtree(buffers, ignore_errors=True)
+        if not args.data and not args.keep:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return report(args, results)
+
+
+def report(args, results):
+    return {'time': strftime('%Y-%m-%d %H:%M:%S', gmtime()),
+            'commit': commit(),
+            'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                        'cpus': mp.cpu_count()},
+            'numpy': np.__version__,
+            'trigger_backend': trigger.BACKEND,
+            'start_method': mp.get_start_method() if hasattr(mp, 'get_start_method') else None,
+            'params': {'boxes': args.boxes, 'days': args.days, 'thresholds': args.thresholds,
+                       'rate': args.rate, 'bursts': args.bursts, 'workers': args.workers,
+                       'draws': args.draws, 'seed': args.seed, 'startup': args.startup},
+            'results': results}
+
+
+def commit():
+    """returns the git commit of this tree, None outside of a git checkout"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT,
+                                       cwd=path.dirname(path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Tetra-II benchmarks on synthetic data')
+    parser.add_argument('--boxes', type=int, nargs='+', default=[1, 4],
+                        help='box counts to time, at most %d' % len(BOXES))
+    parser.add_argument('--days', type=int, nargs='+', default=[1], help='durations to time')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[10, 30],
+                        help='thresholds to time the histogram and draw stages at')
+    parser.add_argument('--rate', type=float, default=100,
+                        help='background counts per second of each device')
+    parser.add_argument('--bursts', type=int, default=20, help='injected bursts per day')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes of the pool stage, defaults to the core count')
+    parser.add_argument('--draws', type=int, default=50, help='most events drawn per draw stage')
+    parser.add_argument('--backend', choices=sorted(trigger._BACKENDS), default=trigger.BACKEND,
+                        help='trigger backend of the rates stage')
+    parser.add_argument('--date', default='2015_01_01', help='date of the first synthetic day')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', default=None,
+                        help='directory for the synthetic data, kept afterwards; a temporary one by default')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary data directory')
+    parser.add_argument('--startup', action='store_true', help='only time start up')
+    parser.add_argument('--check', action='store_true',
+                        help='only check that bursts on chunk and resume boundaries are found once')
+    parser.add_argument('--out', default='bench.json', help='JSON report file')
+    args = parser.parse_args(argv)
+    if max(args.boxes) > len(BOXES):
+        parser.error('--boxes can be at most %d' % len(BOXES))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    trigger.set_backend(args.backend)
+    if args.check:
+        sys.exit(1 if check(args) else 0)
+    report = run(args)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=1)
+
+
+if __name__ == '__main__':
+    mp.freeze_support()
+    main()
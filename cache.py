@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of per-day run_rates() results.
+
+Entries are keyed by box, day, reader and the size/mtime of that day's raw
+files, so editing a raw file only invalidates its own day. Days without raw
+files that rawdata.day_files() can find are never cached. Summaries of the
+'times' reader don't depend on the threshold, so one entry serves every
+threshold; those of rates() hold only the events at the threshold it was run
+at and are kept per threshold. The cache is shared by all worker processes and
+trimmed to a maximum size, least recently used entries first.
+"""
+
+import os
+from os import path
+import hashlib
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from rawdata import day_files, fingerprint
+
+
+FORMAT = 7      #bumped whenever stored summaries change, so old entries are missed
+
+
+class ResultCache(object):
+
+    """A directory of pickled (summary, errors) results"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def key(self, name, day, path0, reader='rates', threshold=None):
+        """returns the cache key of a work unit summarized with reader (see workers.READERS),
+        at threshold for readers whose summaries depend on it
+
+        None if no raw files of the day are found: nothing would tell an edit
+        apart, so such days aren't cached
+        """
+        stamp = fingerprint(day_files(path0, name, day))
+        if not stamp:
+            return None
+        text = repr((FORMAT, name, day, reader, threshold, stamp))
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _file(self, key):
+        return path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        """returns the stored (summary, errors), or None on a miss"""
+        f = self._file(key)
+        try:
+            with open(f, 'rb') as fh:
+                entry = pickle.load(fh)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            #mark as recently used
+            os.utime(f, None)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, entry):
+        f = self._file(key)
+        tmp = '%s.%d.tmp' % (f, os.getpid())
+        with open(tmp, 'wb') as fh:
+            pickle.dump(entry, fh, pickle.HIGHEST_PROTOCOL)
+        try:
+            if path.isfile(f):
+                os.remove(f)
+            os.rename(tmp, f)
+        except OSError:
+            #another worker stored the same entry first
+            if path.isfile(tmp):
+                os.remove(tmp)
+        self.evict()
+
+    def evict(self):
+        """removes least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pkl'):
+                continue
+            f = path.join(self.directory, name)
+            try:
+                size = path.getsize(f)
+                entries.append((path.getmtime(f), size, f))
+            except OSError:
+                continue
+            total += size
+        entries.sort()
+        for mtime, size, f in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+            total -= size
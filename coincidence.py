@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Coincidences between boxes of the same region.
+
+Events of all boxes are put on one time line (seconds since the first day of
+the run) and sorted once by region and time. Walking the sorted events, each
+one joins the group of the one before it if it is in the same region and
+follows it within window seconds. Groups seen by at least MIN_BOXES different
+boxes are coincidences. The sort dominates, so a search over N events costs
+O(N log N) however many boxes and days they come from. Events without a time
+of day (see events.untimed()) are left out.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from stations import REGIONS, REGION_OF
+from events import timed
+
+
+WINDOW = 0.004          #seconds, default coincidence window (two 2 ms trigger bins)
+MIN_BOXES = 2
+
+
+def day_offsets(days):
+    """returns the seconds from the first of days ('YYYY_MM_DD') to the start of each"""
+    if not len(days):
+        return np.zeros(0)
+    first = datetime.strptime(days[0], '%Y_%m_%d')
+    return np.array([(datetime.strptime(d, '%Y_%m_%d') - first).days * 86400.0 for d in days])
+
+
+def find_groups(times, boxes, regions, window=WINDOW, min_boxes=MIN_BOXES):
+    """returns the coincident groups of events, each an array of event indices in time order
+
+    times are the events' absolute times in seconds, boxes and regions their
+    integer box and region ids. Groups come in time order.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    boxes = np.asarray(boxes, dtype=np.int64)
+    regions = np.asarray(regions, dtype=np.int64)
+    if not len(times):
+        return []
+    order = np.lexsort((times, regions))
+    t = times[order]
+    r = regions[order]
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (np.diff(t) > window) | (r[1:] != r[:-1])
+    group = np.cumsum(new) - 1
+    #count the distinct boxes of each group through its unique (group, box) pairs
+    span = boxes.max() + 1
+    pairs = np.unique(group * span + boxes[order])
+    seen = np.bincount(pairs // span, minlength=group[-1] + 1)
+    bounds = np.append(np.flatnonzero(new), len(order))
+    groups = [order[bounds[g]:bounds[g+1]] for g in np.flatnonzero(seen >= min_boxes)]
+    #groups are in region order so far
+    groups.sort(key=lambda g: times[g[0]])
+    return groups
+
+
+def region_ids(names):
+    """returns the index in stations.REGIONS of each box name, -1 if it isn't in one"""
+    index = dict((region, i) for i, (region, boxes) in enumerate(REGIONS))
+    return np.array([index.get(REGION_OF.get(name), -1) for name in names], dtype=np.int64)
+
+
+def table_groups(table, names, window=WINDOW, min_boxes=MIN_BOXES):
+    """returns the coincident groups among an EventTable's events at or above its threshold
+
+    names are the box names of the table's box indices. Each group is an array of
+    record indices.
+    """
+    records = table.records
+    rows = np.flatnonzero((records['sigma'] >= table.threshold) & timed(records['t0']))
+    if not rows.size:
+        return []
+    times = day_offsets(table.days)[records['day'][rows]] + records['t0'][rows]
+    boxes = records['box'][rows]
+    regions = region_ids(names)[boxes]
+    #boxes outside every region never coincide
+    inside = regions >= 0
+    rows, times, boxes, regions = rows[inside], times[inside], boxes[inside], regions[inside]
+    return [rows[g] for g in find_groups(times, boxes, regions, window, min_boxes)]
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Index of per-box, per-day overview figures, kept up to date as days are analysed.
+
+Each analysed day of a box leaves one INDEX_DTYPE record: how many candidates
+peaked in each whole sigma from summary.FLOOR up (so the event count at any
+slider threshold is a sum; rates() events count at the threshold they were
+found at, see summary.from_rates()), the highest sigma, the average and minimum count
+rate over its 10 s blocks with data, and the fraction of the day with data
+(nan, like the rates, for summaries without blocks, see summary.from_rates()).
+Records are built from DaySummary objects only, so the index never reads raw
+data, and a year of the whole array is a few MB held in one .npy file per data
+path under info/index/.
+"""
+
+import os
+from os import path
+import hashlib
+import threading
+from datetime import date, datetime
+
+import numpy as np
+
+from stations import BOXES
+from summary import FLOOR, SPAN, DAY
+
+
+SIGMAS = 31         #whole sigma bins from FLOOR, the last one also holds everything above
+
+INDEX_DTYPE = np.dtype([('box', np.int16),          #index into stations.BOXES
+                        ('day', np.int32),          #date.toordinal()
+                        ('sigmas', np.int32, (SIGMAS,)),
+                        ('max_sigma', np.float32),
+                        ('avg', np.float32),        #counts per second
+                        ('min', np.float32),        #counts per second, lowest 10 s block
+                        ('coverage', np.float32),   #fraction of the day with data
+                        ('done', np.float32)])      #seconds of the day analysed
+
+FIELDS = ('events', 'avg', 'min', 'max_sigma', 'coverage')
+
+
+def index_file(directory, path0):
+    """returns the index file in directory for the data under path0"""
+    name = hashlib.sha1(path.normpath(path0).encode('utf-8')).hexdigest()[:12]
+    return path.join(directory, name + '.npy')
+
+
+def ordinal(day):
+    """returns the date.toordinal() of day ('YYYY_MM_DD')"""
+    return datetime.strptime(day, '%Y_%m_%d').toordinal()
+
+
+def day_name(n):
+    """returns the 'YYYY_MM_DD' of ordinal n"""
+    return date.fromordinal(int(n)).strftime('%Y_%m_%d')
+
+
+def year_days(year):
+    """returns the ordinals of every day of year"""
+    first = date(year, 1, 1).toordinal()
+    return np.arange(first, date(year + 1, 1, 1).toordinal())
+
+
+class DayIndex(object):
+
+    """The overview records of one data path, loaded from and saved to filename
+
+    update() is safe to call from the worker pool's collector thread. Changes
+    are only written by save().
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.records = np.zeros(0, dtype=INDEX_DTYPE)
+        self.dirty = False
+        self.lock = threading.Lock()
+        if path.isfile(filename):
+            try:
+                self.records = np.load(filename)
+            except (IOError, OSError, ValueError):
+                #unreadable index, it is rebuilt as days are analysed again
+                pass
+        self._rows = dict(((int(r['box']), int(r['day'])), i) for i, r in enumerate(self.records))
+
+    def __len__(self):
+        return len(self.records)
+
+    def update(self, summary):
+        """records the overview of a DaySummary, replacing any earlier record of its box and day"""
+        if summary.name not in BOXES:
+            return
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record['box'] = BOXES.index(summary.name)
+        record['day'] = ordinal(summary.day)
+        sigma = np.asarray(summary.sigma, dtype=np.float64)
+        bins = np.clip(np.floor(sigma) - FLOOR, 0, SIGMAS - 1).astype(np.int64)
+        record['sigmas'] = np.bincount(bins, minlength=SIGMAS)[:SIGMAS]
+        record['max_sigma'] = sigma.max() if sigma.size else 0
+        counts = np.asarray(summary.counts)
+        covered = counts[counts > 0]
+        record['avg'] = covered.sum() / (len(covered) * SPAN) if covered.size else np.nan
+        record['min'] = covered.min() / SPAN if covered.size else np.nan
+        #summaries of rates() events have no blocks to measure rates or coverage by
+        record['coverage'] = len(covered) * SPAN / DAY if counts.size else np.nan
+        record['done'] = summary.done
+        key = int(record['box'][0]), int(record['day'][0])
+        with self.lock:
+            if key in self._rows:
+                self.records[self._rows[key]] = record[0]
+            else:
+                self._rows[key] = len(self.records)
+                self.records = np.concatenate((self.records, record))
+            self.dirty = True
+
+    def save(self):
+        """writes the records to filename if they changed since they were loaded or saved"""
+        with self.lock:
+            if not self.dirty:
+                return
+            directory = path.dirname(self.filename)
+            if directory and not path.isdir(directory):
+                os.makedirs(directory)
+            tmp = '%s.%d.tmp' % (self.filename, os.getpid())
+            with open(tmp, 'wb') as f:
+                np.save(f, self.records)
+            if path.isfile(self.filename):
+                os.remove(self.filename)
+            os.rename(tmp, self.filename)
+            self.dirty = False
+
+    def grid(self, days, field, threshold=FLOOR):
+        """returns a (len(BOXES), len(days)) array of field for each box and day ordinal
+
+        field is one of FIELDS, 'events' being the candidates at or above
+        threshold. Days that weren't analysed are nan.
+        """
+        out = np.full((len(BOXES), len(days)), np.nan)
+        with self.lock:
+            records = self.records.copy()
+        col = np.searchsorted(days, records['day'])
+        ok = (col < len(days))
+        ok[ok] = days[col[ok]] == records['day'][ok]
+        records = records[ok]
+        if field == 'events':
+            first = int(np.clip(np.ceil(threshold) - FLOOR, 0, SIGMAS - 1))
+            values = records['sigmas'][:, first:].sum(axis=1)
+        else:
+            values = records[field]
+        out[records['box'], col[ok]] = values
+        return out
+
+    def record(self, box, day):
+        """returns the record of box (a name) on day (an ordinal), None if there is none"""
+        if box not in BOXES:
+            return None
+        with self.lock:
+            i = self._rows.get((BOXES.index(box), int(day)))
+            return None if i is None else self.records[i].copy()
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""
+Candidate events found by the rates pass.
+
+An event keeps the raw count times within WINDOW seconds of its peak, once.
+Histograms at any bin width are built from those times when first asked for,
+so adding a bin size costs nothing in the workers or the pipe back to the GUI.
+Events found by plot_hists_gui3.rates() have no raw times, only the 2 ms and
+20 us histograms rates() made of them, and keep those instead. When their date
+has no time of day either, their t0 is untimed(): negative, so it can't be
+placed on a time line (see timed()), but still unique within its day.
+
+Workers hand out Event objects, the GUI keeps the events of a run in an
+EventTable: one record per event over shared buffers of raw times. Its
+histograms are kept in a HistCache of bounded size, which a Prefetcher fills
+ahead of page navigation.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+WINDOW = 0.5            #seconds of raw data kept either side of an event
+DAY = 86400
+HALF_BINS = 25000       #most bins either side of an event in its histograms
+CACHE_BYTES = 64 * 2**20    #histogram counts kept by an EventTable
+
+EVENT_DTYPE = np.dtype([('id', np.int64),       #stable across inserts and drops
+                        ('box', np.int16),      #tab index
+                        ('day', np.int32),      #index into EventTable.days
+                        ('t0', np.float64),     #seconds of day
+                        ('sigma', np.float32),
+                        ('avg', np.float32),
+                        ('min', np.int32),
+                        ('buf', np.int32),      #index into EventTable.buffers
+                        ('offset', np.int64),   #start of the raw times in that buffer
+                        ('length', np.int32)])
+
+
+TIME_OF_DAY = re.compile(r'(\d{1,2}):(\d{2}):(\d{2}(?:\.\d*)?)\s*$')
+
+
+def date(day, t):
+    """returns the 'YYYY_MM_DD HH:MM:SS.sss' time of t seconds into day"""
+    return '%s %02d:%02d:%06.3f' % (day, t // 3600, t % 3600 // 60, t % 60)
+
+
+def time_of_day(text):
+    """returns the seconds of day of a date ending in HH:MM:SS(.sss), nan if it has no time"""
+    match = TIME_OF_DAY.search(str(text))
+    if match is None:
+        return np.nan
+    return 3600 * int(match.group(1)) + 60 * int(match.group(2)) + float(match.group(3))
+
+
+def untimed(index):
+    """returns the t0 of the index-th event of a day whose time of day isn't known
+
+    keys stay unique and the events stay in their day's order, before the timed ones
+    """
+    return float(index - DAY)
+
+
+def timed(t0):
+    """True where t0 (a number or array) is a time of day rather than an untimed() key"""
+    return np.asarray(t0) >= 0
+
+
+_edges = {}
+
+
+def bin_times(times, width):
+    """returns [counts, left edges] of raw times relative to an event at bin width
+
+    the edges only depend on width and are shared by all histograms
+    """
+    half = min(WINDOW, width * HALF_BINS)
+    n = int(round(2 * half / width))
+    ind = np.floor((times + half) / width).astype(np.int64)
+    counts = np.bincount(ind[(ind >= 0) & (ind < n)], minlength=n).astype(np.int32)
+    if width not in _edges:
+        _edges[width] = width * np.arange(n) - half
+    return [counts, _edges[width]]
+
+
+class HistCache(object):
+
+    """Histograms by key, least recently used dropped first once their counts
+    take more than max_bytes. Safe to use from several threads."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        with self.lock:
+            hist = self.entries.pop(key, None)
+            if hist is not None:
+                self.entries[key] = hist
+            return hist
+
+    def put(self, key, hist):
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = hist
+            self.nbytes += hist[0].nbytes
+            while self.nbytes > self.max_bytes and len(self.entries) > 1:
+                old = self.entries.popitem(last=False)[1]
+                self.nbytes -= old[0].nbytes
+
+
+class Event(object):
+
+    """One candidate event of a box
+
+    t0 is the event time in seconds of day, times are the raw count times
+    relative to t0. avg is the background mean count per 2 ms bin and minimum the
+    lowest 2 ms count around the event. hists, if given, are histograms made
+    elsewhere ({bin width: [counts, left edges]}), rates()' own for its events,
+    and are returned for their widths instead of binning times.
+    """
+
+    def __init__(self, t0, times, sigma, avg, date, minimum=None, hists=None):
+        self.t0 = t0
+        self.times = times
+        self.sigma = sigma
+        self.avg = avg
+        self.date = date
+        self.hists = hists or {}
+        self._hists = {}
+        if minimum is None:
+            minimum = int(self.histogram(0.002)[0].min())
+        self.minimum = minimum
+
+    def __getstate__(self):
+        #histograms are rebuilt on the other side instead of being pickled
+        state = self.__dict__.copy()
+        state['_hists'] = {}
+        return state
+
+    def histogram(self, width):
+        """returns [counts, left edges] at bin width, edges relative to t0"""
+        if width in self.hists:
+            return self.hists[width]
+        if width not in self._hists:
+            self._hists[width] = bin_times(self.times, width)
+        return self._hists[width]
+
+    def info(self):
+        """returns the (avg, min, date) shown in the Info group"""
+        return self.avg, self.minimum, self.date
+
+
+class EventTable(object):
+
+    """The candidate events of a run, one EVENT_DTYPE record each
+
+    Raw times are not copied: each record points at a slice of one of the
+    buffers, usually the memory mapped event times of a whole day summary.
+    Records of every candidate down to summary.FLOOR are kept and threshold is
+    applied when reading, so changing it doesn't touch the records. Pages are
+    1-based positions among a box's records at or above threshold, in
+    (day, t0) order. Events with histograms of their own (see Event) are also
+    kept in fixed by record id, their histograms and info come from them.
+    Records added one event at a time while a day streams in wait in a list
+    and are joined to records on its next use, once per batch of results.
+    """
+
+    def __init__(self, days=(), threshold=30):
+        self.days = list(days)
+        self.threshold = threshold
+        self._records = np.zeros(0, dtype=EVENT_DTYPE)
+        self._added = []
+        self.buffers = []
+        self._next_id = 0
+        self._rows = {}
+        self.fixed = {}
+        self.hists = HistCache()
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def records(self):
+        if self._added:
+            self._records = np.concatenate([self._records] + self._added)
+            self._added = []
+        return self._records
+
+    @records.setter
+    def records(self, records):
+        self._records = records
+        self._added = []
+
+    def add(self, box, day, events, times=None, spans=None):
+        """adds events of box on day (an index into days)
+
+        times and spans, if given, are a buffer holding the raw times of all events
+        and each event's (start, stop) in it, otherwise each event's own times
+        are used as its buffer
+        """
+        new = np.zeros(len(events), dtype=EVENT_DTYPE)
+        if not len(new):
+            return
+        new['id'] = self._next_id + np.arange(len(new))
+        self._next_id += len(new)
+        new['box'] = box
+        new['day'] = day
+        new['t0'] = [e.t0 for e in events]
+        new['sigma'] = [e.sigma for e in events]
+        new['avg'] = [e.avg for e in events]
+        new['min'] = [e.minimum for e in events]
+        for i, e in zip(new['id'], events):
+            if e.hists:
+                self.fixed[i] = e
+        if times is None:
+            new['buf'] = len(self.buffers) + np.arange(len(new))
+            new['length'] = [len(e.times) for e in events]
+            self.buffers.extend(e.times for e in events)
+        else:
+            spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+            new['buf'] = len(self.buffers)
+            new['offset'] = spans[:, 0]
+            new['length'] = spans[:, 1] - spans[:, 0]
+            self.buffers.append(times)
+        self._added.append(new)
+        self._rows.pop(box, None)
+
+    def drop(self, box, day=None):
+        """removes the records of box (only those on day, if given)"""
+        records = self.records
+        mask = records['box'] == box
+        if day is not None:
+            mask &= records['day'] == day
+        if not mask.any():
+            return
+        #buffers only the dropped records point into are released
+        bufs = np.unique(records['buf'][mask])
+        for buf in bufs[~np.isin(bufs, records['buf'][~mask])]:
+            self.buffers[buf] = None
+        if self.fixed:
+            for i in records['id'][mask]:
+                self.fixed.pop(i, None)
+        self.records = records[~mask]
+        self._rows.pop(box, None)
+
+    def set_threshold(self, threshold):
+        self.threshold = threshold
+        self._rows = {}
+
+    def rows(self, box):
+        """returns the record indices of box's pages, in page order"""
+        if box not in self._rows:
+            rows = np.flatnonzero((self.records['box'] == box) &
+                                  (self.records['sigma'] >= self.threshold))
+            order = np.lexsort((self.records['t0'][rows], self.records['day'][rows]))
+            self._rows[box] = rows[order]
+        return self._rows[box]
+
+    def count(self, box):
+        """returns the number of pages of box"""
+        return len(self.rows(box))
+
+    def row(self, box, page):
+        """returns the record index shown on page of box"""
+        return self.rows(box)[page-1]
+
+    def find(self, box, key):
+        """returns the page of box showing key (a (day, t0) pair), 0 if there is none"""
+        if key is None:
+            return 0
+        rows = self.rows(box)
+        match = np.flatnonzero((self.records['day'][rows] == key[0]) &
+                               (self.records['t0'][rows] == key[1]))
+        return match[0] + 1 if match.size else 0
+
+    def key(self, i):
+        """returns the (day, t0) of record i, which survives re-adding its day"""
+        return int(self.records['day'][i]), float(self.records['t0'][i])
+
+    def times(self, i):
+        r = self.records[i]
+        return self.buffers[r['buf']][r['offset']:r['offset'] + r['length']]
+
+    def histogram(self, i, width):
+        """returns [counts, left edges] of record i at bin width, edges relative to t0"""
+        key = self.records['id'][i], width
+        if key[0] in self.fixed and width in self.fixed[key[0]].hists:
+            return self.fixed[key[0]].hists[width]
+        hist = self.hists.get(key)
+        if hist is None:
+            hist = bin_times(self.times(i), width)
+            self.hists.put(key, hist)
+        return hist
+
+    def jobs(self, box, page, widths, reach):
+        """returns (key, times, width) of the histograms near page of box that aren't built yet
+
+        nearest first: page itself, then page+1, page-1, page+2, ... up to reach
+        pages away, at each of widths
+        """
+        rows = self.rows(box)
+        pages = [page]
+        for x in range(1, reach + 1):
+            pages.extend((page + x, page - x))
+        jobs = []
+        for p in pages:
+            if not 1 <= p <= len(rows):
+                continue
+            i = rows[p-1]
+            for width in widths:
+                key = self.records['id'][i], width
+                if key not in self.hists and key[0] not in self.fixed:
+                    jobs.append((key, self.times(i), width))
+        return jobs
+
+    def info(self, i):
+        """returns the (avg, min, date) shown in the Info group for record i"""
+        r = self.records[i]
+        if r['id'] in self.fixed:
+            return self.fixed[r['id']].info()
+        return float(r['avg']), int(r['min']), date(self.days[r['day']], r['t0'])
+
+
+class Prefetcher(object):
+
+    """Builds histograms in a background thread so paging finds them ready
+
+    Only the latest request is worked on, jobs of earlier ones are dropped.
+    """
+
+    def __init__(self):
+        self.table = None
+        self.pending = []
+        self.cond = threading.Condition()
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def request(self, table, jobs):
+        """replaces the queued jobs by table.jobs() output"""
+        with self.cond:
+            self.table = table
+            self.pending = list(jobs)
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                table = self.table
+                key, times, width = self.pending.pop(0)
+            if key not in table.hists:
+                table.hists.put(key, bin_times(times, width))
@@ -0,0 +1,1466 @@
+# -*- coding: utf-8 -*-
+"""
+@author: Jonah Hoffman
+
+The analysis window, started by analysis.py. matplotlib is only imported the
+first time something is drawn, see figure_classes().
+"""
+
+import sys
+from os import startfile, getcwd, path, makedirs
+import multiprocessing as mp
+from functools import partial
+from calendar import monthrange
+from time import gmtime, strftime, time
+from datetime import datetime, date
+from copy import copy
+import re
+import threading
+
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+import numpy as np
+from PySide import QtGui, QtCore
+
+from workers import WorkerPool, split_days, RATES, READERS
+from rawdata import day_bytes
+from summary import DAY, FLOOR
+from events import EventTable, Prefetcher, timed
+from render import HistogramPlot
+from cache import ResultCache
+from metrics import RunMetrics
+from coincidence import table_groups, day_offsets
+from pyramid import RatePyramid
+from dayindex import DayIndex, index_file, year_days, day_name, FIELDS
+from stations import BOXES, REGION_OF
+
+
+DISPATCH_INTERVAL = 40     #ms between GUI updates from results, at most 25 a second
+DISPATCH_BUDGET = 0.02      #seconds of results handled per update, the rest wait for the next
+
+
+class ResultBus(QtCore.QObject):
+
+    """Hands results from the worker pool's collector thread to the GUI thread
+
+    Callbacks made by wrap() only queue their call. A timer on the GUI thread
+    runs the queued calls every DISPATCH_INTERVAL ms, for at most DISPATCH_BUDGET
+    seconds, then calls flush() once so widgets are updated once per batch
+    rather than once per result.
+    """
+
+    def __init__(self, flush, on_error, parent=None):
+        super(ResultBus, self).__init__(parent)
+        self.queue = Queue()
+        self.flush = flush
+        self.on_error = on_error
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.drain)
+        self.timer.start(DISPATCH_INTERVAL)
+
+    def post(self, func, *args):
+        """queues func(*args) to run on the GUI thread, safe from any thread"""
+        self.queue.put((func, args))
+
+    def wrap(self, func):
+        """returns a callback that queues its calls to func"""
+        return partial(self.post, func)
+
+    def drain(self):
+        began = time()
+        handled = 0
+        while time() - began < DISPATCH_BUDGET:
+            try:
+                func, args = self.queue.get_nowait()
+            except Empty:
+                break
+            handled += 1
+            try:
+                func(*args)
+            except Exception as inst:
+                self.on_error(inst, 'could not handle a result')
+        if handled:
+            try:
+                self.flush()
+            except Exception as inst:
+                self.on_error(inst, 'could not update the display')
+
+
+def figure_classes():
+    """returns matplotlib's Figure, Qt canvas and toolbar classes, importing them on first use"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_qt4agg import FigureCanvasQTAgg as FigureCanvas
+    from matplotlib.backends.backend_qt4agg import NavigationToolbar2QT as NavigationToolbar
+    return Figure, FigureCanvas, NavigationToolbar
+
+
+class CanvasWidget(QtGui.QWidget):
+
+    """A tab's canvas, its axes and histogram artists are kept and updated in place
+
+    The figure is only made the first time the tab draws something, so tabs
+    that never show an event cost no matplotlib. see render.HistogramPlot for
+    how histograms are drawn
+    """
+
+    def __init__(self):
+        super(CanvasWidget, self).__init__()
+        self.canvas = None
+        self.setLayout(QtGui.QVBoxLayout())
+
+    def _make_figure(self):
+        Figure, FigureCanvas, NavigationToolbar = figure_classes()
+        self.fig = Figure(figsize=(8, 6), dpi=72, facecolor=(1, 1, 1), edgecolor=(0, 0, 0))
+        self.canvas = FigureCanvas(self.fig)
+        self.toolbar = NavigationToolbar(self.canvas, self)
+        self.ax = self.fig.add_subplot(111)
+        self.artists = HistogramPlot(self.ax)
+        self.layout().addWidget(self.canvas)
+        self.layout().addWidget(self.toolbar)
+
+    def clear(self):
+        if self.canvas is None:
+            return
+        self.artists.clear()
+        self.canvas.draw_idle()
+
+    def plot(self, hist, width):
+        """shows hist ([counts, left edges relative to the event]) at bin width"""
+        if self.canvas is None:
+            self._make_figure()
+        self.artists.plot(hist, width)
+        #forget zoom/pan views of the previous histogram
+        self.toolbar.update()
+        self.canvas.draw_idle()
+
+
+class RatePlot(QtGui.QWidget):
+
+    """A widget that processes and displays rate information for events in selected data"""
+
+    def __init__(self):
+        super(RatePlot, self).__init__()
+        self.initUI()
+
+    def initUI(self):
+        #set variables
+        self.path = 'C:/tetra2/array/'
+        self.date = '2015_01_01'
+        self.workers = mp.cpu_count()
+        self.cache_size = 500
+        self.watch_interval = 30
+        self.coincidence_window = 0.004
+        self.profile = False
+        self.reader = RATES
+        self.array = []
+        self.errorlog = str(getcwd()) + '/info/errorlog.txt'
+        self.config = str(getcwd()) + '/info/config.txt'
+        self.get_config()
+        self.duration = 1
+        self.threshold = 30
+        self.set_lists()
+        self.pool = None
+        self.prefetcher = Prefetcher()
+        self.todo = 0
+        self.run = 0
+        self.watching = set()
+        self.cycle = 0      #watch cycles since the run started, 0 while the run itself goes
+        self.first_new = 0  #the first of the days the current watch cycle added
+        self.metrics = None
+        self.day_index = None
+        self.progress = {}
+        self.costs = {}
+        self.balanced = False
+        self.bus = ResultBus(self.show_progress, self.log_error, self)
+        self.watchTimer = QtCore.QTimer(self)
+        self.watchTimer.timeout.connect(self.watch)
+        #rates() runs again once the threshold slider rests
+        self.rerunTimer = QtCore.QTimer(self)
+        self.rerunTimer.setSingleShot(True)
+        self.rerunTimer.timeout.connect(self.rerun)
+
+        #create widgets
+        #box Tree
+        boxTree = QtGui.QTreeWidget(self)
+        header = QtGui.QTreeWidgetItem(['Box Select', 'Events'])
+        boxTree.setHeaderItem(header)
+        boxTree.setFixedWidth(240)
+        boxTree.itemClicked.connect(self.tree_clicked)
+        boxTree.setColumnWidth(0, 160)
+        boxTree.setColumnWidth(1, 60)
+
+        brParent = QtGui.QTreeWidgetItem(boxTree)
+        brParent.setText(0, 'LSU')
+        for x in xrange(2):
+            child = QtGui.QTreeWidgetItem(brParent, ['LSU_0{}'.format(x+1), '--'])
+            child.setFlags(child.flags() | QtCore.Qt.ItemIsUserCheckable)
+            child.setCheckState(0, QtCore.Qt.Unchecked)
+            self.array.append(child)
+
+        alParent = QtGui.QTreeWidgetItem(boxTree)
+        alParent.setText(0, 'Huntsville')
+        for x in xrange(2):
+            child = QtGui.QTreeWidgetItem(alParent, ['UAH_0{}'.format(x+1), '--'])
+            child.setFlags(child.flags() | QtCore.Qt.ItemIsUserCheckable)
+            child.setCheckState(0, QtCore.Qt.Unchecked)
+            self.array.append(child)
+
+        prParent = QtGui.QTreeWidgetItem(boxTree)
+        prParent.setText(0, 'Puerto Rico')
+        for x in xrange(9):
+            child = QtGui.QTreeWidgetItem(prParent, ['PR_0{}'.format(x+1), '--'])
+            child.setFlags(child.flags() | QtCore.Qt.ItemIsUserCheckable)
+            child.setCheckState(0, QtCore.Qt.Unchecked)
+            self.array.append(child)
+        child = QtGui.QTreeWidgetItem(prParent, ['PR_10', '--'])
+        child.setFlags(child.flags() | QtCore.Qt.ItemIsUserCheckable)
+        child.setCheckState(0, QtCore.Qt.Unchecked)
+        self.array.append(child)
+
+        paParent = QtGui.QTreeWidgetItem(boxTree)
+        paParent.setText(0, 'Panama')
+        for x in xrange(5):
+            child = QtGui.QTreeWidgetItem(paParent, ['PA_0{}'.format(x+1), '--'])
+            child.setFlags(child.flags() | QtCore.Qt.ItemIsUserCheckable)
+            child.setCheckState(0, QtCore.Qt.Unchecked)
+            self.array.append(child)
+
+        #date widgets
+        self.yearBox = QtGui.QSpinBox()
+        self.yearBox.setRange(2015, max(2017, date.today().year))
+        self.yearBox.setValue(int(self.date[:4]))
+        self.yearBox.setSingleStep(1)
+        self.yearBox.valueChanged.connect(self.set_year)
+
+        self.monthBox = QtGui.QSpinBox()
+        self.monthBox.setRange(1, 12)
+        self.monthBox.setValue(int(self.date[5:7]))
+        self.monthBox.setSingleStep(1)
+        self.monthBox.valueChanged.connect(self.set_month)
+
+        self.dayBox = QtGui.QSpinBox()
+        self.dayBox.setRange(1, 31)
+        self.dayBox.setValue(int(self.date[8:10]))
+        self.dayBox.setSingleStep(1)
+        self.dayBox.valueChanged.connect(self.set_day)
+
+        self.durationBox = QtGui.QSpinBox()
+        self.durationBox.setRange(1, 1000)
+        self.durationBox.setSingleStep(1)
+        self.durationBox.valueChanged.connect(self.get_enddate)
+
+        #threshold widgets
+        self.threshLbl = QtGui.QLabel(str(self.threshold)+u' \u03C3', self)
+        self.threshLbl.setAlignment(QtCore.Qt.AlignCenter)
+        self.threshLbl.setMargin(2)
+        self.threshLbl.setFixedHeight(20)
+        self.threshLbl.setFixedWidth(40)
+
+        self.threshSlider = QtGui.QSlider(QtCore.Qt.Horizontal, self)
+        self.threshSlider.setMinimum(10)
+        self.threshSlider.setMaximum(40)
+        self.threshSlider.setValue(30)
+        self.threshSlider.setTickPosition(QtGui.QSlider.TicksAbove)
+        self.threshSlider.setTickInterval(10)
+        self.threshSlider.valueChanged.connect(self.set_threshold)
+
+        #Bin Widgets
+        self.sBinBtn = QtGui.QRadioButton('2 ms', self)
+        self.sBinBtn.toggled.connect(self.set_bins)
+
+        self.lBinBtn = QtGui.QRadioButton('20 '+u'\u03BC'+'s', self)
+        self.lBinBtn.toggled.connect(self.set_bins)
+
+        #Graph Control Widgets
+        graphBtn = QtGui.QPushButton('Graph', self)
+        graphBtn.clicked.connect(self.graph)
+
+        cancelBtn = QtGui.QPushButton('Cancel', self)
+        cancelBtn.clicked.connect(self.cancel)
+
+        prevBtn = QtGui.QPushButton('Previous', self)
+        prevBtn.clicked.connect(self.prev_graph)
+
+        nextBtn = QtGui.QPushButton('Next', self)
+        nextBtn.clicked.connect(self.next_graph)
+
+        self.pageLbl = QtGui.QLabel('0 of 0', self)
+        self.pageLbl.setAlignment(QtCore.Qt.AlignCenter)
+
+        self.watchBox = QtGui.QCheckBox('Watch', self)
+        self.watchBox.toggled.connect(self.set_watch)
+
+        #info widgets
+        self.dateLbl = QtGui.QLabel('--', self)
+        self.dateLbl.setFrameStyle(QtGui.QFrame.Panel | QtGui.QFrame.Sunken)
+        self.dateLbl.setAlignment(QtCore.Qt.AlignCenter)
+        self.dateLbl.setMargin(2)
+        self.dateLbl.setFixedHeight(20)
+        self.dateLbl.setFixedWidth(150)
+
+        self.aveCountLbl = QtGui.QLabel('--', self)
+        self.aveCountLbl.setFrameStyle(QtGui.QFrame.Panel | QtGui.QFrame.Sunken)
+        self.aveCountLbl.setAlignment(QtCore.Qt.AlignCenter)
+        self.aveCountLbl.setMargin(2)
+        self.aveCountLbl.setFixedHeight(20)
+
+        self.minCountLbl = QtGui.QLabel('--', self)
+        self.minCountLbl.setFrameStyle(QtGui.QFrame.Panel | QtGui.QFrame.Sunken)
+        self.minCountLbl.setAlignment(QtCore.Qt.AlignCenter)
+        self.minCountLbl.setMargin(2)
+        self.minCountLbl.setFixedHeight(20)
+
+        #top status bar
+        statusLbl = QtGui.QLabel('status:', self)
+
+        self.status = QtGui.QLabel('--', self)
+        self.status.setFrameStyle(QtGui.QFrame.Panel | QtGui.QFrame.Sunken)
+        self.status.setAlignment(QtCore.Qt.AlignCenter)
+        self.status.setMargin(2)
+        self.status.setFixedHeight(20)
+        self.status.setFixedWidth(160)
+        
+        #infoBox
+        self.infoBox = QtGui.QListWidget(self)
+        self.infoBox.setFixedWidth(240)
+        self.infoBox.setFixedHeight(200)
+
+        #setup graph, figures are made when a tab first draws
+        self.canvas = CanvasWidget()
+        self.tabs = QtGui.QTabWidget()
+
+        self.tabs.insertTab(0, self.canvas, 'Empty')
+
+        #setup layout
+        dateGroup = QtGui.QGroupBox('Dates')
+        dateLayout = QtGui.QGridLayout()
+        dateLayout.addWidget(QtGui.QLabel('Year', self), 0, 0, 1, 1)
+        dateLayout.addWidget(QtGui.QLabel('Month', self), 0, 1, 1, 1)
+        dateLayout.addWidget(QtGui.QLabel('Day', self), 0, 2, 1, 1)
+        dateLayout.addWidget(self.yearBox, 1, 0, 1, 1)
+        dateLayout.addWidget(self.monthBox, 1, 1, 1, 1)
+        dateLayout.addWidget(self.dayBox, 1, 2, 1, 1)
+        dateLayout.addWidget(QtGui.QLabel('Duration:', self), 2, 1, 1, 1)
+        dateLayout.addWidget(self.durationBox, 2, 2, 1, 1)
+        dateGroup.setLayout(dateLayout)
+
+        threshGroup = QtGui.QGroupBox('Threshold')
+        threshLayout = QtGui.QGridLayout()
+        threshLayout.addWidget(self.threshLbl, 0, 0, 1, 1)
+        threshLayout.addWidget(self.threshSlider, 0, 1, 1, 2)
+        threshGroup.setLayout(threshLayout)
+
+        binGroup = QtGui.QGroupBox('Bin Size')
+        binLayout = QtGui.QGridLayout()
+        binLayout.addWidget(self.sBinBtn, 0, 0, 1, 1)
+        binLayout.addWidget(self.lBinBtn, 0, 1, 1, 1)
+        binGroup.setLayout(binLayout)
+
+        graphGroup = QtGui.QGroupBox('Graph')
+        graphLayout = QtGui.QGridLayout()
+        graphLayout.addWidget(graphBtn, 0, 0, 1, 2)
+        graphLayout.addWidget(cancelBtn, 0, 2, 1, 1)
+        graphLayout.addWidget(self.watchBox, 1, 0, 1, 2)
+        graphLayout.addWidget(prevBtn, 2, 0, 1, 1)
+        graphLayout.addWidget(nextBtn, 2, 1, 1, 1)
+        graphLayout.addWidget(self.pageLbl, 2, 2, 1, 1)
+        graphGroup.setLayout(graphLayout)
+        
+        infoGroup = QtGui.QGroupBox('Info')
+        infoLayout = QtGui.QGridLayout()
+        infoLayout.addWidget(QtGui.QLabel('Date:', self), 0, 0, 1, 1)
+        infoLayout.addWidget(self.dateLbl, 0, 1, 1, 1)
+        infoLayout.addWidget(QtGui.QLabel('Ave Rate:', self), 1, 0, 1, 1)
+        infoLayout.addWidget(self.aveCountLbl, 1, 1, 1, 1)
+        infoLayout.addWidget(QtGui.QLabel('Min Rate:', self), 2, 0, 1, 1)
+        infoLayout.addWidget(self.minCountLbl, 2, 1, 1, 1)
+        infoGroup.setLayout(infoLayout)
+        
+        statusLayout = QtGui.QHBoxLayout()
+        statusLayout.addWidget(statusLbl)
+        statusLayout.addWidget(self.status)
+        statusLayout.setAlignment(QtCore.Qt.AlignLeft)
+        
+        boxLayout = QtGui.QVBoxLayout()
+        boxLayout.addLayout(statusLayout)
+        boxLayout.addWidget(boxTree)
+        boxLayout.addWidget(QtGui.QLabel('Run Messages', self))
+        boxLayout.addWidget(self.infoBox)
+        
+        graphLayout = QtGui.QVBoxLayout()
+        graphLayout.addWidget(self.tabs)
+        #graphLayout.addWidget(self.toolbar)
+        
+        topLayout = QtGui.QHBoxLayout()
+        topLayout.addLayout(boxLayout)
+        topLayout.addLayout(graphLayout)
+        
+        bottomLayout = QtGui.QGridLayout()
+        bottomLayout.addWidget(dateGroup, 0, 1, 2, 1)
+        bottomLayout.addWidget(threshGroup, 0, 0, 1, 1)
+        bottomLayout.addWidget(binGroup, 1, 0, 1, 1)
+        bottomLayout.addWidget(graphGroup, 0, 4, 2, 1)
+        bottomLayout.addWidget(infoGroup, 0, 3, 2, 1)
+        bottomLayout.setAlignment(QtCore.Qt.AlignTop)
+        
+        mainLayout = QtGui.QVBoxLayout()
+        mainLayout.addLayout(topLayout)
+        mainLayout.addLayout(bottomLayout)
+        self.setLayout(mainLayout)
+        
+        #final setup
+        self.ndx = self.tabs.currentIndex
+        self.sBinBtn.setChecked(True)
+        self.tabs.currentChanged.connect(self.changed_tabs)
+        
+    def graph(self, balanced=False):
+        #block if currently graphing
+        if self.todo > 0:
+            return
+        #re/initialize varables
+        self.status.setText('--')
+        self.infoBox.clear()
+        for i in range(19):
+            self.array[i].setText(1, '--')
+        self.tabs.clear()
+        self.set_lists()
+        self.watching = set()
+        self.cycle = 0
+        self.progress = {}
+        try:
+            pool = self.get_pool()
+        except Exception as inst:
+            self.log_error(inst, message='could not start worker pool')
+            return
+        #release the buffers of the previous run
+        pool.sweep()
+        self.run += 1
+        days = split_days(self.date, self.duration)
+        self.table = EventTable(days, self.threshold)
+        self.first_new = len(days)
+        checked = [x for x in self.array if x.checkState(0) != QtCore.Qt.CheckState.Unchecked]
+        names = [str(x.text(0)) for x in checked]
+        self.get_day_index()
+        self.costs = {}
+        self.balanced = balanced
+        self.metrics = RunMetrics(self.metrics_file(), boxes=names, days=days, path=self.path,
+                                  workers=pool.size, spawn=pool.spawn, balanced=balanced)
+        #queue a work unit for each day of each selected box
+        for ind, box in zip(range(19), checked):
+            self.tabs.insertTab(ind, CanvasWidget(), box.text(0))
+            self.todo += 1
+            self.summaries[ind] = [None for day in days]
+            self.bins[ind] = 0.002 if self.sBinBtn.isChecked() else 0.00002
+            for n, day in enumerate(days):
+                self._submit_day(pool, ind, str(box.text(0)), n, day)
+            if ind == 0:
+                self.status.setText('Graphing...') #set status
+        #if no boxes selected, revert to default tab
+        if self.tabs.count() == 0:
+            self.tabs.addTab(self.canvas, 'Empty')
+            return
+        #listing the raw data can take a while on big runs or network drives, so the
+        #queue starts in tab order and is reordered by size once it is known
+        thread = threading.Thread(target=self._estimate_costs,
+                                  args=(self.run, names, days, self.path))
+        thread.daemon = True
+        thread.start()
+
+    def _estimate_costs(self, run, names, days, path0):
+        #runs in its own thread, hands the raw data of each unit to _set_costs()
+        costs = {}
+        try:
+            for name in names:
+                for day, size in zip(days, day_bytes(path0, name, days)):
+                    costs[name, day] = size
+                costs[name] = sum(costs[name, day] for day in days)
+        except (IOError, OSError):
+            #the queue stays in tab order
+            return
+        self.bus.post(self._set_costs, run, costs, sum(costs[name] for name in names))
+
+    def _set_costs(self, run, costs, total):
+        #called through the result bus once the run's raw data is listed
+        if run != self.run:
+            return
+        self.costs = costs
+        if self.metrics is not None:
+            self.metrics.info(bytes=total)
+        if self.todo > 0:
+            self.pool.reprioritize(self.priority)
+
+    def _submit_day(self, pool, ind, name, n, day):
+        pool.submit((name, day, self.path, 0, self.threshold),
+                    self.bus.wrap(partial(self._day_done, self.run, ind, name, n)),
+                    self.bus.wrap(partial(self._stream_event, self.run, ind, name, n)),
+                    self.priority((name, day)))
+
+    def priority(self, args):
+        """returns the queue priority of the work unit args, (name, day, path) or longer
+
+        The current tab's box goes first. The others follow lightest box first,
+        so boxes with little data aren't held up behind busy ones, except in a
+        balanced region batch where they are all one group. Within those, the
+        units with the most data start first, so the last to finish are short.
+        Until _set_costs() has the sizes, units go in tab and day order.
+        """
+        name, day = args[0], args[1]
+        current = self.ndx() >= 0 and str(self.tabs.tabText(self.ndx())) == name
+        box = 0 if self.balanced else self.costs.get(name, 0)
+        return (0 if current else 1, box, -self.costs.get((name, day), 0))
+
+    def get_pool(self):
+        """returns the worker pool, starting it on first use so later runs reuse its processes"""
+        if self.pool is None:
+            cache = None
+            if self.cache_size > 0:
+                cache = ResultCache(str(getcwd()) + '/info/cache/', self.cache_size * 2**20)
+            profile = None
+            if self.profile:
+                profile = str(getcwd()) + '/info/profiles/'
+                if not path.isdir(profile):
+                    makedirs(profile)
+            self.pool = WorkerPool(self.workers, cache, profile=profile, reader=self.reader)
+        return self.pool
+
+    def metrics_file(self):
+        """returns a new file in info/metrics/ for the timings of a run or watch cycle"""
+        directory = str(getcwd()) + '/info/metrics/'
+        if not path.isdir(directory):
+            makedirs(directory)
+        name = '_%d.jsonl' % self.run
+        if self.cycle:
+            name = '_%d_watch%d.jsonl' % (self.run, self.cycle)
+        return directory + strftime('%Y%m%d_%H%M%S', gmtime()) + name
+
+    def get_day_index(self):
+        """returns the overview index of the current path, saving that of the previous one"""
+        filename = index_file(str(getcwd()) + '/info/index/', self.path)
+        if self.day_index is None or self.day_index.filename != filename:
+            self.save_day_index()
+            self.day_index = DayIndex(filename)
+        return self.day_index
+
+    def save_day_index(self):
+        if self.day_index is None:
+            return
+        try:
+            self.day_index.save()
+        except (IOError, OSError) as inst:
+            self.log_error(inst, 'could not save day index')
+
+    def close_pool(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        
+    def _day_done(self, run, ind, name, n, summary, errors):
+        #called through the result bus as each day finishes
+        if run != self.run:
+            #finished after its run was cancelled
+            return
+        if summary == -1:
+            self.log_error(errors[0], 'could not run rates()')
+        else:
+            self.day_index.update(summary)
+            if summary.stats is not None:
+                self.metrics.unit(name, self.table.days[n], summary.stats)
+        for error in errors:
+            self.infoBox.addItem(str(error))
+        self.summaries[ind][n] = summary
+        self.pyramids.pop(ind, None)
+        #the day's streamed events are replaced by the summary's, whose times are mapped
+        shown = self.shown_key(ind)
+        self.table.drop(ind, n)
+        if summary != -1:
+            self.table.add(ind, n, summary.events, summary.times, summary.spans)
+        if not self.is_done(ind):
+            self._show_progress(ind, name, shown)
+            return
+        self.todo -= 1
+        self.progress.pop(ind, None)
+        began = time()
+        #finished boxes don't take the user away from the tab they are on
+        self._rate_plot(ind, name, shown)
+        self.metrics.stage(name, 'plot', time() - began)
+        if self.todo == 0:
+            self.status.setText('Done Graphing')
+        self._units_done()
+
+    def _units_done(self):
+        """closes the metrics and saves the day index once the last unit of the run or
+        watch cycle is in"""
+        if self.todo > 0 or self.watching or self.metrics is None:
+            return
+        if not self.cycle:
+            #sum up where the run's time went
+            for line in self.metrics.summary():
+                self.infoBox.addItem(line)
+        self.metrics.close()
+        self.metrics = None
+        self.save_day_index()
+
+    def _stream_event(self, run, ind, name, n, event):
+        #called through the result bus for each event as it is found
+        if run != self.run or self.summaries[ind][n] is not None:
+            return
+        shown = self.shown_key(ind)
+        self.table.add(ind, n, [event])
+        if event.sigma >= self.threshold:
+            self._show_progress(ind, name, shown)
+
+    def _show_progress(self, ind, name, shown):
+        #box ind is updated once per batch of results by show_progress(), keep the
+        #event it showed before the batch
+        self.progress.setdefault(ind, (name, shown))
+
+    def shown_key(self, ind):
+        """returns the key of the event box ind shows, or showed before results still to be shown"""
+        if ind in self.progress:
+            return self.progress[ind][1]
+        return self.current_key(ind)
+
+    def show_progress(self):
+        """updates the boxes that got results in the last batch"""
+        progress, self.progress = self.progress, {}
+        for ind, (name, shown) in progress.items():
+            #keep showing the same event while a box is running, or show the first one in
+            self.currentPlot[ind] = self.table.find(ind, shown)
+            if not self.currentPlot[ind] and self.table.count(ind):
+                self.currentPlot[ind] = 1
+                self._draw(ind)
+            for box in [box for box in self.array if box.text(0) == name]:
+                box.setText(1, str(self.table.count(ind)))
+            if ind == self.ndx():
+                self.set_num_plots()
+
+    def set_watch(self):
+        if self.watchBox.isChecked():
+            self.watchTimer.start(1000 * self.watch_interval)
+            self.watch()
+        else:
+            self.watchTimer.stop()
+
+    def watch(self):
+        """queues the data written since each day of the run was summarized
+
+        Only days that aren't over yet are looked at. With the times reader each
+        picks up where its summary ends, so only new files and the appended ends of
+        old ones are read, rates() reads the whole day again. Every day from the end
+        of the run up to today (UTC) is added to it. A cycle starts once the last
+        one is over and has a metrics file of its own.
+        """
+        if self.todo > 0 or self.watching or self.pool is None or not self.table.days:
+            return
+        tabs = [ind for ind in range(self.tabs.count()) if self.summaries[ind] != 0]
+        units = [(ind, n) for ind in tabs for n, summary in enumerate(self.summaries[ind])
+                 if summary is not None and summary != -1 and summary.done < DAY]
+        missing = (datetime.utcnow() - datetime.strptime(self.table.days[-1], '%Y_%m_%d')).days
+        new = split_days(self.table.days[-1], missing + 1)[1:] if tabs and missing > 0 else []
+        if not units and not new:
+            return
+        self.cycle += 1
+        self.first_new = len(self.table.days)
+        names = [str(self.tabs.tabText(ind)) for ind in tabs]
+        self.metrics = RunMetrics(self.metrics_file(), boxes=names, days=new, path=self.path,
+                                  workers=self.pool.size, spawn=self.pool.spawn, watch=self.cycle,
+                                  updated=len(units))
+        for day in new:
+            self.table.days.append(day)
+            for ind in tabs:
+                self.summaries[ind].append(None)
+                self.pyramids.pop(ind, None)
+                self.todo += 1
+                self._submit_day(self.pool, ind, str(self.tabs.tabText(ind)),
+                                 len(self.table.days) - 1, day)
+        for ind, n in units:
+            name = str(self.tabs.tabText(ind))
+            self.watching.add((ind, n))
+            args = (name, self.table.days[n], self.path, self.summaries[ind][n].done,
+                    self.threshold)
+            #priorities are tuples, the pool's default 0 can't be compared with them
+            self.pool.submit(args, self.bus.wrap(partial(self._watch_done, self.run, ind, name, n)),
+                             priority=self.priority(args))
+
+    def _watch_done(self, run, ind, name, n, part, errors):
+        #called through the result bus with the summary of a day's new data
+        if run != self.run:
+            return
+        self.watching.discard((ind, n))
+        for error in errors:
+            self.infoBox.addItem(str(error))
+        if part == -1:
+            self.log_error(errors[0], 'could not run rates()')
+            self._units_done()
+            return
+        if part.stats is not None:
+            self.metrics.unit(name, self.table.days[n], part.stats)
+        shown = self.shown_key(ind)
+        if part.start == 0:
+            #rates() summarizes the whole day again, its events replace the old ones
+            self.summaries[ind][n] = part
+            self.table.drop(ind, n)
+        else:
+            self.summaries[ind][n] = self.summaries[ind][n].extend(part)
+        self.pyramids.pop(ind, None)
+        self.day_index.update(self.summaries[ind][n])
+        self.table.add(ind, n, part.events, part.times, part.spans)
+        self._show_progress(ind, name, shown)
+        self._units_done()
+
+    def current_key(self, ind):
+        """returns the (day, t0) of the event shown for box ind, None if there is none"""
+        if not self.currentPlot[ind]:
+            return None
+        return self.table.key(self.table.row(ind, self.currentPlot[ind]))
+
+    def is_done(self, ind):
+        """True once every day of box ind has been summarized"""
+        return self.summaries[ind] != 0 and None not in self.summaries[ind]
+
+    def _rate_plot(self, ind, name, shown=None):
+        #check which bin size to use
+        if self.sBinBtn.isChecked():
+            self.bins[ind] = 0.002
+        else:
+            self.bins[ind] = 0.00002
+        #stay on the event that was shown if it is still selected
+        self.currentPlot[ind] = self.table.find(ind, shown) or min(1, self.table.count(ind))
+        try:
+            self._draw(ind)
+        except Exception as inst:
+            self.log_error(inst, 'could not update figure')
+            return
+        for box in [box for box in self.array if box.text(0) == name]:
+            box.setText(1, str(self.table.count(ind)))
+        self.set_num_plots()
+        
+    def show_event(self, ind, key):
+        """switches to the tab of box ind and the page showing key, if it is still selected"""
+        page = self.table.find(ind, key)
+        if not page:
+            return
+        self.currentPlot[ind] = page
+        self.tabs.setCurrentIndex(ind)
+        self._draw(ind)
+        self.set_num_plots()
+
+    def show_day(self, box, day):
+        """sets the date to day ('YYYY_MM_DD') for one day and checks box, ready to graph"""
+        self.yearBox.setValue(int(day[:4]))
+        self.monthBox.setValue(int(day[5:7]))
+        self.dayBox.setValue(int(day[8:10]))
+        self.durationBox.setValue(1)
+        for item in self.array:
+            if item.text(0) == box:
+                item.setCheckState(0, QtCore.Qt.Checked)
+
+    def rate_series(self, ind):
+        """returns the RatePyramid of box ind over the run, the seconds from the run's start
+        to each of its events over threshold with a time of day and their keys, None if it
+        hasn't been graphed
+
+        the pyramid is kept until a day of the box gets a new summary
+        """
+        if ind < 0 or self.summaries[ind] == 0:
+            return None
+        offsets = day_offsets(self.table.days)
+        if ind not in self.pyramids:
+            self.pyramids[ind] = RatePyramid(self.summaries[ind], offsets)
+        rows = self.table.rows(ind)
+        rows = rows[timed(self.table.records['t0'][rows])]
+        times = offsets[self.table.records['day'][rows]] + self.table.records['t0'][rows]
+        return self.pyramids[ind], times, [self.table.key(i) for i in rows]
+
+    def coincidences(self):
+        """returns the coincident groups among the run's events, see coincidence.table_groups()"""
+        names = [str(self.tabs.tabText(ind)) for ind in range(self.tabs.count())]
+        return names, table_groups(self.table, names, self.coincidence_window)
+
+    def _draw(self, ind):
+        """draws the current event of box ind in its tab, or clears the tab if there is none"""
+        canvas = self.tabs.widget(ind)
+        if self.currentPlot[ind]:
+            row = self.table.row(ind, self.currentPlot[ind])
+            canvas.plot(self.table.histogram(row, self.bins[ind]), self.bins[ind])
+            #get the neighbouring pages and the other bin size ready in the background
+            self.prefetcher.request(self.table, self.table.jobs(ind, self.currentPlot[ind],
+                                                                (0.002, 0.00002), 3))
+        else:
+            canvas.clear()
+
+    def cancel(self):
+        if (self.todo == 0 and not self.watching) or self.pool is None:
+            return
+        self.run += 1
+        self.pool.cancel()
+        self.watching = set()
+        self.progress = {}
+        if self.metrics is not None:
+            self.metrics.close()
+            self.metrics = None
+        #stop watching too, and take off the days Watch added but didn't finish,
+        #so boxes that were done before it stay done
+        self.watchBox.setChecked(False)
+        boxes = [ind for ind in range(self.tabs.count()) if self.summaries[ind] != 0]
+        if any(None in self.summaries[ind][self.first_new:] for ind in boxes):
+            del self.table.days[self.first_new:]
+            for ind in boxes:
+                shown = self.current_key(ind)
+                for n in range(self.first_new, len(self.summaries[ind])):
+                    self.table.drop(ind, n)
+                del self.summaries[ind][self.first_new:]
+                self.pyramids.pop(ind, None)
+                self.currentPlot[ind] = self.table.find(ind, shown) or min(1, self.table.count(ind))
+                self._draw(ind)
+                self._set_count(ind, str(self.table.count(ind)))
+        #finished boxes keep their events, unfinished ones go back to their set_lists() state
+        for ind in range(self.tabs.count()):
+            if not self.is_done(ind):
+                self.summaries[ind] = 0
+                self.pyramids.pop(ind, None)
+                self.table.drop(ind)
+                self.currentPlot[ind] = 0
+                self._draw(ind)
+                self._set_count(ind, '--')
+        self.todo = 0
+        self.set_num_plots()
+        self.status.setText('Cancelled')
+        
+    def _set_count(self, ind, text):
+        #the Events column of box ind in the box tree
+        for box in [box for box in self.array if box.text(0) == self.tabs.tabText(ind)]:
+            box.setText(1, text)
+
+    def log_error(self, inst, message):
+        f = open(self.errorlog, 'a+')
+        with f:
+            f.write(strftime('%Y-%m-%d %H:%M:%S   Error: ', gmtime()) 
+                    + ' [' + str(message) + ']  '
+                    + str(type(inst)) 
+                    + '  ("' + str(inst) + '")' + '\n\n')
+        self.status.setText('Error')
+         
+    def get_config(self):
+        if not path.isfile(self.errorlog):
+            open(self.errorlog, 'w+')
+        if not path.isfile(self.config):
+            open(self.config, 'w+')
+            return
+        f = open(self.config, 'r')
+        variables = {'path: ': self._set_path, 
+                     'date: ': self._set_date,
+                     'workers: ': self._set_workers,
+                     'cache: ': self._set_cache_size,
+                     'watch: ': self._set_watch_interval,
+                     'coincidence: ': self._set_coincidence_window,
+                     'profile: ': self._set_profile,
+                     'reader: ': self._set_reader}
+        with f:
+            for line in f:
+                for key, var in variables.iteritems():
+                    if line.startswith(key):
+                         var(str(line)[len(key):-1])                    
+    def _set_path(self, path):
+        self.path = path
+    def _set_date(self, date):
+        self.date = date
+    def _set_workers(self, workers):
+        if int(workers) > 0:
+            self.workers = int(workers)
+    def _set_cache_size(self, size):
+        self.cache_size = int(size)
+    def _set_watch_interval(self, seconds):
+        if int(seconds) > 0:
+            self.watch_interval = int(seconds)
+    def _set_coincidence_window(self, ms):
+        if float(ms) > 0:
+            self.coincidence_window = float(ms) / 1000
+    def _set_profile(self, on):
+        self.profile = on.strip() not in ('', '0', 'off', 'no')
+    def _set_reader(self, reader):
+        if reader.strip() in READERS:
+            self.reader = reader.strip()
+        
+    def set_path(self):
+        dirname = QtGui.QFileDialog.getExistingDirectory(self)
+        if dirname == '':
+            return
+        dirname = re.sub('\\\\', '/', dirname) + '/'
+        self.path = dirname
+        f = open(self.config, 'r')
+        text = []
+        found = False
+        with f:
+            for line in f:
+                if line.startswith('path:'):
+                    text.append('path: %s\n' % str(dirname))
+                    found = True
+                else:
+                    text.append(line)
+        if not found:
+            text.append('\npath: %s\n' % str(dirname))
+        f = open(self.config, 'w+')
+        with f:
+            for line in text:
+                f.write(line)
+                
+    def save_date(self):
+        f = open(self.config, 'r')
+        text = []
+        found = False
+        with f:
+            for line in f:
+                if line.startswith('date:'):
+                    text.append('date: %s\n' % str(self.date))
+                    found = True
+                else:
+                    text.append(line)
+        if not found:
+            text.append('\ndate: %s\n' % str(self.date))
+        f = open(self.config, 'w+')
+        with f:
+            for line in text:
+                f.write(line)
+        
+    def set_lists(self):
+        self.bins = [0.002 for x in range(19)]
+        self.table = EventTable()
+        self.currentPlot = [0 for x in range(19)]
+        self.summaries = [0 for x in range(19)]
+        self.pyramids = {}
+        
+    def tree_clicked(self, item, column):
+        if item.text(0) in ['LSU', 'Huntsville', 'Puerto Rico', 'Panama']:
+            self.region_clicked(item, column)
+        else:
+            self.box_clicked(item, column)
+            
+    def region_clicked(self, item, column):
+        """graphs every box of the region, and only those, as one balanced batch
+
+        asks first, as it replaces the checked boxes and the current results
+        """
+        if self.todo > 0:
+            return
+        inside = [box for box in self.array
+                  if box.parent() is not None and box.parent().text(0) == item.text(0)]
+        answer = QtGui.QMessageBox.question(
+            self, 'Graph region',
+            'Graph the %d boxes of %s as one batch? The current results are cleared.'
+            % (len(inside), item.text(0)),
+            QtGui.QMessageBox.Yes | QtGui.QMessageBox.No, QtGui.QMessageBox.No)
+        if answer != QtGui.QMessageBox.Yes:
+            return
+        for box in self.array:
+            box.setCheckState(0, QtCore.Qt.Checked if box in inside else QtCore.Qt.Unchecked)
+        self.graph(balanced=True)
+    
+    def box_clicked(self, item, column):
+        pass
+
+    def set_year(self):
+        self.date = str(self.yearBox.value()) + self.date[4:10]
+        self.dayBox.setRange(1, monthrange(self.yearBox.value(), 
+                                           self.monthBox.value())[1])
+        self.get_enddate()
+        
+    def set_month(self):
+        if self.monthBox.value() < 10:
+            self.date = self.date[0:5] + '0' + str(self.monthBox.value()) + self.date[7:10]
+        else:
+            self.date = self.date[0:5] + str(self.monthBox.value()) + self.date[7:10]
+        self.dayBox.setRange(1, monthrange(self.yearBox.value(), 
+                                           self.monthBox.value())[1])
+        self.get_enddate()
+        
+    def set_day(self):
+        if self.dayBox.value() < 10:
+            self.date = self.date[0:8] + '0' + str(self.dayBox.value())
+        else:
+            self.date = self.date[0:8] + str(self.dayBox.value())
+        self.get_enddate()
+        
+    def get_enddate(self):
+        self.duration = self.durationBox.value()
+        
+    def set_threshold(self):
+        self.threshold = self.threshSlider.value()
+        self.threshLbl.setText(str(self.threshold)+u' \u03C3')
+        if self.reader == RATES:
+            #rates() only returns the events of the threshold it ran at
+            if any(summaries != 0 for summaries in self.summaries[:self.tabs.count()]):
+                self.rerunTimer.start(500)
+            return
+        #the table keeps every candidate, a new threshold only changes which are shown
+        shown = [self.current_key(ind) for ind in range(self.tabs.count())]
+        self.table.set_threshold(self.threshold)
+        for ind in range(self.tabs.count()):
+            if self.summaries[ind] != 0:
+                self._rate_plot(ind, str(self.tabs.tabText(ind)), shown[ind])
+        
+    def rerun(self):
+        """graphs the run again at the current threshold, stopping it first if it is going
+
+        days rates() already ran at this threshold come from the cache
+        """
+        if self.todo > 0 or self.watching:
+            self.run += 1
+            self.pool.cancel()
+            self.watching = set()
+            self.todo = 0
+            if self.metrics is not None:
+                self.metrics.close()
+                self.metrics = None
+        self.graph(balanced=self.balanced)
+
+    def set_bins(self):
+        #histograms are built from the events' raw times on first use
+        if self.sBinBtn.isChecked():
+            self.bins[self.ndx()] = 0.002
+        else:
+            self.bins[self.ndx()] = 0.00002
+        if self.currentPlot[self.ndx()]:
+            self._draw(self.ndx())
+    
+    def changed_tabs(self):
+        #the new tab's queued days go first
+        if self.todo > 0 and self.pool is not None:
+            self.pool.reprioritize(self.priority)
+        self.set_num_plots()
+        if self.sBinBtn.isChecked() and self.bins[self.ndx()] != 0.002:
+            self.set_bins()
+        elif self.lBinBtn.isChecked() and self.bins[self.ndx()] != 0.00002:
+            self.set_bins()
+
+    def set_num_plots(self):
+        pageText = str(self.currentPlot[self.ndx()]) + ' of ' + str(self.table.count(self.ndx()))
+        self.pageLbl.setText(pageText)
+        if self.currentPlot[self.ndx()] != 0:
+            info = self.table.info(self.table.row(self.ndx(), self.currentPlot[self.ndx()]))
+            self.dateLbl.setText(str(info[2]))
+            self.minCountLbl.setText(str(info[1]))
+            self.aveCountLbl.setText(str('%.3f' % info[0]))
+        else:
+            self.dateLbl.setText('--')
+            self.minCountLbl.setText('--')
+            self.aveCountLbl.setText('--')
+            
+    def prev_graph(self):
+        if self.currentPlot[self.ndx()] > 1:
+            i = self.ndx()
+            self.currentPlot[i] = self.currentPlot[i] - 1
+            self._draw(i)
+            self.set_num_plots()
+            
+            
+    def next_graph(self):
+        if self.currentPlot[self.ndx()] < self.table.count(self.ndx()):
+            i = self.ndx()
+            self.currentPlot[i] = self.currentPlot[i] + 1
+            self._draw(i)
+            self.set_num_plots()
+            
+
+class CoincidenceView(QtGui.QWidget):
+
+    """A window listing the events seen by several boxes of one region at once
+
+    Each group shows its region, time and boxes, with one child row per event.
+    Double clicking an event shows it in its box's tab.
+    """
+
+    def __init__(self, center):
+        super(CoincidenceView, self).__init__()
+        self.center = center
+        self.initUI()
+
+    def initUI(self):
+        self.tree = QtGui.QTreeWidget(self)
+        self.tree.setHeaderItem(QtGui.QTreeWidgetItem(['Region / Box', 'Date', 'Boxes', 'Sigma']))
+        self.tree.setColumnWidth(0, 140)
+        self.tree.setColumnWidth(1, 190)
+        self.tree.itemDoubleClicked.connect(self.event_clicked)
+
+        self.countLbl = QtGui.QLabel('--', self)
+
+        refreshBtn = QtGui.QPushButton('Refresh', self)
+        refreshBtn.clicked.connect(self.refresh)
+
+        bottomLayout = QtGui.QHBoxLayout()
+        bottomLayout.addWidget(self.countLbl)
+        bottomLayout.addStretch()
+        bottomLayout.addWidget(refreshBtn)
+
+        mainLayout = QtGui.QVBoxLayout()
+        mainLayout.addWidget(self.tree)
+        mainLayout.addLayout(bottomLayout)
+        self.setLayout(mainLayout)
+        self.setGeometry(250, 250, 560, 400)
+        self.setWindowTitle('Coincidences')
+
+    def refresh(self):
+        """lists the coincidences among the events of the current run at the current threshold"""
+        table = self.center.table
+        names, groups = self.center.coincidences()
+        self.tree.clear()
+        for group in groups:
+            boxes = sorted(set(names[table.records['box'][i]] for i in group))
+            first = table.info(group[0])[2]
+            parent = QtGui.QTreeWidgetItem(self.tree, [REGION_OF[boxes[0]], first, ', '.join(boxes),
+                                                       '%.1f' % table.records['sigma'][group].max()])
+            for i in group:
+                child = QtGui.QTreeWidgetItem(parent, [names[table.records['box'][i]],
+                                                       table.info(i)[2], '',
+                                                       '%.1f' % table.records['sigma'][i]])
+                child.setData(0, QtCore.Qt.UserRole, (int(table.records['box'][i]), table.key(i)))
+        self.countLbl.setText('%d coincidences, %.1f ms window' %
+                              (len(groups), 1000 * self.center.coincidence_window))
+
+    def event_clicked(self, item, column):
+        target = item.data(0, QtCore.Qt.UserRole)
+        if target is not None:
+            self.center.show_event(*target)
+
+
+class RateView(QtGui.QWidget):
+
+    """A window showing the count rate of the current tab's box over the whole run
+
+    The mean rate is drawn over the band between the rates of the lowest and
+    highest 2 ms bins, at the level of the box's RatePyramid that matches the
+    zoom, so panning and zooming over weeks redraws about two points per pixel.
+    Triangles mark the events over threshold, clicking one shows it in its tab.
+    """
+
+    def __init__(self, center):
+        super(RateView, self).__init__()
+        self.center = center
+        self.ind = None
+        self.pyramid = None
+        self.keys = []
+        self.initUI()
+
+    def initUI(self):
+        self.boxLbl = QtGui.QLabel('--', self)
+
+        refreshBtn = QtGui.QPushButton('Refresh', self)
+        refreshBtn.clicked.connect(self.refresh)
+
+        Figure, FigureCanvas, NavigationToolbar = figure_classes()
+        self.fig = Figure(figsize=(10, 4), dpi=72, facecolor=(1, 1, 1))
+        self.canvas = FigureCanvas(self.fig)
+        self.toolbar = NavigationToolbar(self.canvas, self)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_ylabel('counts/s')
+        #limits are set by refresh() and zoomed(), autoscaling would call zoomed() again
+        self.ax.set_autoscale_on(False)
+        self.mean, = self.ax.plot([], [], color='b', linewidth=1)
+        self.band = None
+        #markers sit at the top of the axes whatever the rates
+        self.markers, = self.ax.plot([], [], 'v', color='r', picker=5,
+                                     transform=self.ax.get_xaxis_transform())
+        self.ax.callbacks.connect('xlim_changed', self.zoomed)
+        self.canvas.mpl_connect('pick_event', self.marker_picked)
+
+        topLayout = QtGui.QHBoxLayout()
+        topLayout.addWidget(self.boxLbl)
+        topLayout.addStretch()
+        topLayout.addWidget(refreshBtn)
+
+        mainLayout = QtGui.QVBoxLayout()
+        mainLayout.addLayout(topLayout)
+        mainLayout.addWidget(self.canvas)
+        mainLayout.addWidget(self.toolbar)
+        self.setLayout(mainLayout)
+        self.setGeometry(250, 250, 900, 400)
+        self.setWindowTitle('Rates')
+
+    def refresh(self):
+        """shows the whole run of the current tab's box"""
+        ind = self.center.ndx()
+        series = self.center.rate_series(ind)
+        if series is None:
+            self.pyramid = None
+            self.boxLbl.setText('nothing graphed')
+            return
+        self.ind = ind
+        self.pyramid, times, self.keys = series
+        self.markers.set_data(times / 3600.0, np.full(len(times), 0.97))
+        self.boxLbl.setText('%s, %d events >= %d sigma' % (self.center.tabs.tabText(ind),
+                                                         len(times), self.center.threshold))
+        self.ax.set_xlabel('hours from %s 00:00' % self.center.table.days[0])
+        #redraws through zoomed()
+        self.ax.set_xlim(0, len(self.pyramid) / 3600.0)
+        self.toolbar.update()
+
+    def zoomed(self, ax):
+        if self.pyramid is None:
+            return
+        t0, t1 = [3600 * x for x in self.ax.get_xlim()]
+        x, mean, low, high = self.pyramid.view(t0, t1, 2 * self.canvas.width())
+        x = x / 3600.0
+        self.mean.set_data(x, mean)
+        if self.band is not None:
+            self.band.remove()
+        self.band = self.ax.fill_between(x, low, high, color='b', alpha=0.25, linewidth=0)
+        if np.isfinite(high).any():
+            top = np.nanmax(high)
+            self.ax.set_ylim(0, 1.05 * top if top > 0 else 1)
+        self.canvas.draw_idle()
+
+    def marker_picked(self, event):
+        if event.artist is self.markers and len(event.ind):
+            self.center.show_event(self.ind, self.keys[event.ind[0]])
+
+
+class OverviewView(QtGui.QWidget):
+
+    """A window showing a year of every box at a glance, one cell per box and day
+
+    Cells are coloured by the chosen figure of the day from the day index
+    (see dayindex.py), so no raw data is read. Days never analysed are grey.
+    Clicking a cell shows its figures, double clicking sets the date and checks
+    the box to graph it.
+    """
+
+    LABELS = {'events': 'Events', 'avg': 'Ave Rate', 'min': 'Min Rate',
+              'max_sigma': 'Max Sigma', 'coverage': 'Coverage'}
+
+    def __init__(self, center):
+        super(OverviewView, self).__init__()
+        self.center = center
+        self.days = None
+        self.initUI()
+
+    def initUI(self):
+        self.fieldBox = QtGui.QComboBox(self)
+        for field in FIELDS:
+            self.fieldBox.addItem(self.LABELS[field], field)
+        self.fieldBox.currentIndexChanged.connect(self.refresh)
+
+        self.yearBox = QtGui.QSpinBox()
+        self.yearBox.setRange(2015, self.center.yearBox.maximum())
+        self.yearBox.setValue(int(self.center.date[:4]))
+        self.yearBox.valueChanged.connect(self.refresh)
+
+        self.cellLbl = QtGui.QLabel('--', self)
+
+        refreshBtn = QtGui.QPushButton('Refresh', self)
+        refreshBtn.clicked.connect(self.refresh)
+
+        Figure, FigureCanvas, NavigationToolbar = figure_classes()
+        self.fig = Figure(figsize=(10, 5), dpi=72, facecolor=(1, 1, 1))
+        self.canvas = FigureCanvas(self.fig)
+        self.ax = self.fig.add_subplot(111)
+        self.image = None
+        self.colorbar = None
+        self.canvas.mpl_connect('button_press_event', self.cell_clicked)
+
+        topLayout = QtGui.QHBoxLayout()
+        topLayout.addWidget(QtGui.QLabel('Year', self))
+        topLayout.addWidget(self.yearBox)
+        topLayout.addWidget(self.fieldBox)
+        topLayout.addStretch()
+        topLayout.addWidget(refreshBtn)
+
+        mainLayout = QtGui.QVBoxLayout()
+        mainLayout.addLayout(topLayout)
+        mainLayout.addWidget(self.canvas)
+        mainLayout.addWidget(self.cellLbl)
+        self.setLayout(mainLayout)
+        self.setGeometry(250, 250, 900, 450)
+        self.setWindowTitle('Overview')
+
+    def field(self):
+        return str(self.fieldBox.itemData(self.fieldBox.currentIndex()))
+
+    def refresh(self):
+        """redraws the year from the day index, events counted at the current threshold"""
+        index = self.center.get_day_index()
+        self.days = year_days(self.yearBox.value())
+        grid = index.grid(self.days, self.field(), self.center.threshold)
+        grid = np.ma.masked_invalid(grid)
+        if self.image is None:
+            from matplotlib import cm
+            cmap = copy(cm.viridis)
+            cmap.set_bad('0.85')
+            self.image = self.ax.imshow(grid, aspect='auto', interpolation='nearest', cmap=cmap,
+                                        extent=(-0.5, grid.shape[1] - 0.5, grid.shape[0] - 0.5, -0.5))
+            self.ax.set_yticks(range(len(BOXES)))
+            self.ax.set_yticklabels(BOXES, fontsize=8)
+            self.colorbar = self.fig.colorbar(self.image, ax=self.ax)
+        else:
+            self.image.set_data(grid)
+            self.image.set_extent((-0.5, grid.shape[1] - 0.5, grid.shape[0] - 0.5, -0.5))
+        months = [date(self.yearBox.value(), m, 1).toordinal() - self.days[0] for m in range(1, 13)]
+        self.ax.set_xticks(months)
+        self.ax.set_xticklabels(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                                 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], fontsize=8)
+        self.ax.set_xlim(-0.5, len(self.days) - 0.5)
+        if grid.count():
+            self.image.set_clim(grid.min(), max(grid.max(), grid.min() + 1e-9))
+        label = self.LABELS[self.field()]
+        if self.field() == 'events':
+            label += ' >= %d sigma' % self.center.threshold
+        self.colorbar.set_label(label)
+        self.cellLbl.setText('%d box days in the index' % len(index))
+        self.canvas.draw_idle()
+
+    def cell_clicked(self, event):
+        if event.inaxes is not self.ax or self.days is None:
+            return
+        col = int(round(event.xdata))
+        row = int(round(event.ydata))
+        if not (0 <= col < len(self.days) and 0 <= row < len(BOXES)):
+            return
+        box = BOXES[row]
+        day = day_name(self.days[col])
+        record = self.center.get_day_index().record(box, self.days[col])
+        if record is None:
+            self.cellLbl.setText('%s %s: not analysed' % (box, day))
+        else:
+            first = max(int(self.center.threshold) - FLOOR, 0)
+            self.cellLbl.setText('%s %s: %d events >= %d sigma, max %.1f sigma, '
+                                 'ave rate %.1f /s, min rate %.1f /s, %.0f%% coverage'
+                                 % (box, day, record['sigmas'][first:].sum(), self.center.threshold,
+                                    record['max_sigma'], record['avg'], record['min'],
+                                    100 * record['coverage']))
+        if event.dblclick:
+            self.center.show_day(box, day)
+
+
+class Window(QtGui.QMainWindow):
+    
+    """The main window of the program"""
+    
+    def __init__(self):
+        super(Window, self).__init__()
+        self.initUI()
+        
+    def initUI(self): 
+        center = RatePlot()
+        self.center = center
+        self.coincidences = None
+        self.overview = None
+        self.rates = None
+        center.tabs.currentChanged.connect(self.refresh_rates)
+       
+        exitAction = QtGui.QAction(QtGui.QIcon('icons/exit.png'), '&Exit', self)
+        exitAction.setShortcut('Ctrl+Q')
+        exitAction.setStatusTip('Exit application')
+        exitAction.triggered.connect(self.close)
+        
+        helpAction = QtGui.QAction('&Help', self)
+        helpAction.setShortcut('Ctrl+H')
+        helpAction.setStatusTip('Open Help File')
+        helpAction.triggered.connect(self.open_help)
+        
+        pathAction = QtGui.QAction('&Path', self)
+        pathAction.setShortcut('Ctrl+P')
+        pathAction.setStatusTip('Set Path')
+        pathAction.triggered.connect(center.set_path)
+        
+        dateAction = QtGui.QAction('&Date', self)
+        dateAction.setShortcut('Ctrl+D')
+        dateAction.setStatusTip('Save current date as default')
+        dateAction.triggered.connect(center.save_date)
+        
+        coincidenceAction = QtGui.QAction('&Coincidences', self)
+        coincidenceAction.setShortcut('Ctrl+K')
+        coincidenceAction.setStatusTip('List events seen by several boxes of a region')
+        coincidenceAction.triggered.connect(self.open_coincidences)
+
+        rateAction = QtGui.QAction('&Rates', self)
+        rateAction.setShortcut('Ctrl+R')
+        rateAction.setStatusTip('Show the count rate of the current box over the run')
+        rateAction.triggered.connect(self.open_rates)
+
+        overviewAction = QtGui.QAction('&Overview', self)
+        overviewAction.setShortcut('Ctrl+O')
+        overviewAction.setStatusTip('Show a year of every box from the day index')
+        overviewAction.triggered.connect(self.open_overview)
+
+        errorAction = QtGui.QAction('&ErrorLog', self)
+        errorAction.setShortcut('Ctrl+E')
+        errorAction.setStatusTip('Open Errorlog')
+        errorAction.triggered.connect(self.open_errorlog)
+        
+        self.statusBar()
+        
+        menubar = self.menuBar()
+        fileMenu = menubar.addMenu('&File')
+        fileMenu.addAction(pathAction)
+        fileMenu.addAction(dateAction)
+        fileMenu.addAction(errorAction)
+        fileMenu.addAction(exitAction)   
+        viewMenu = menubar.addMenu('&View')
+        viewMenu.addAction(coincidenceAction)
+        viewMenu.addAction(overviewAction)
+        viewMenu.addAction(rateAction)
+        helpMenu = menubar.addMenu('&Help')
+        helpMenu.addAction(helpAction)
+        
+        self.setCentralWidget(center)
+        self.setGeometry(200, 200, 900, 700)  
+        self.setWindowTitle('Tetra-II Analysis')
+        self.setWindowIcon(QtGui.QIcon('icons/lsu.png'))
+        self.show()
+        
+    def closeEvent(self, event):
+        self.center.close_pool()
+        self.center.save_day_index()
+        event.accept()
+
+    def open_coincidences(self):
+        if self.coincidences is None:
+            self.coincidences = CoincidenceView(self.center)
+        self.coincidences.refresh()
+        self.coincidences.show()
+        self.coincidences.raise_()
+
+    def open_rates(self):
+        if self.rates is None:
+            self.rates = RateView(self.center)
+        self.rates.refresh()
+        self.rates.show()
+        self.rates.raise_()
+
+    def refresh_rates(self):
+        #follow the current tab while the window is open
+        if self.rates is not None and self.rates.isVisible():
+            self.rates.refresh()
+
+    def open_overview(self):
+        if self.overview is None:
+            self.overview = OverviewView(self.center)
+        self.overview.refresh()
+        self.overview.show()
+        self.overview.raise_()
+
+    def open_help(self):
+        try:
+            startfile(str(getcwd()) + '/info/help.txt')
+        except Exception as inst:
+            self.center.log_error(inst, 'could not open help file')
+            self.center.status.setText('Error')
+            
+    def open_errorlog(self):
+        try:
+            startfile(str(getcwd()) + '/info/errorlog.txt')
+        except Exception as inst:
+            self.center.log_error(inst, 'could not open help file')
+            self.center.status.setText('Error')
+        
+            
+def main():
+    """shows the analysis window and exits when it is closed"""
+    app = QtGui.QApplication.instance()
+    if not app:
+        app = QtGui.QApplication(sys.argv)
+    ex = Window()
+    ex.show()
+    sys.exit(app.exec_())
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Timings of a run, per box, day and stage.
+
+Workers time their own stages of each work unit and send them back with the
+result as a stats dict (see workers._worker_loop):
+
+    wait        seconds between submit() and a worker picking the unit up
+    io          seconds spent opening, indexing and reading raw files
+    bytes       bytes of raw data read
+    rates       seconds of the rates pass, not counting io
+    pack        seconds writing the summary to its buffer file
+    pipe        seconds from the worker sending the result to the collector receiving it
+    unpack      seconds mapping the buffer file back into a summary
+    cached      True when the result came from the ResultCache
+    pid         the worker process
+
+The GUI adds the time spent plotting each box. RunMetrics writes every record
+to a JSON lines file as it comes in and sums them up per box at the end.
+"""
+
+import json
+import threading
+from time import time
+
+
+STAGES = ('wait', 'io', 'rates', 'pack', 'pipe', 'unpack', 'plot')
+WORK = ('io', 'rates', 'pack', 'pipe', 'unpack')    #what a unit costs once a worker has it
+
+
+class RunMetrics(object):
+
+    """The timing records of one run, appended to filename as they come in
+
+    info (the run's boxes, days, worker count, ...) is written as the first record.
+    """
+
+    def __init__(self, filename, **info):
+        self.filename = filename
+        self.started = time()
+        self.boxes = {}
+        self.units = []
+        self.lock = threading.Lock()
+        info['run'] = True
+        self._write(info)
+
+    def _write(self, record):
+        try:
+            with open(self.filename, 'a') as f:
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+        except (IOError, OSError):
+            #metrics must never stop a run
+            pass
+
+    def unit(self, box, day, stats):
+        """records the stats of the work unit of box on day"""
+        record = dict(stats, box=box, day=day)
+        with self.lock:
+            totals = self.boxes.setdefault(box, {})
+            for stage in STAGES + ('bytes',):
+                totals[stage] = totals.get(stage, 0) + record.get(stage, 0)
+            self.units.append((sum(record.get(s, 0) for s in WORK), box, day))
+            self._write(record)
+
+    def info(self, **info):
+        """records facts about the run learned after it started, like those given to __init__"""
+        with self.lock:
+            self._write(info)
+
+    def stage(self, box, stage, seconds):
+        """records seconds spent on stage of box outside the workers, plotting say"""
+        with self.lock:
+            totals = self.boxes.setdefault(box, {})
+            totals[stage] = totals.get(stage, 0) + seconds
+            self._write({'box': box, stage: seconds})
+
+    def summary(self):
+        """returns lines summing up the run per box, slowest unit last"""
+        with self.lock:
+            lines = []
+            for box in sorted(self.boxes):
+                t = self.boxes[box]
+                lines.append('%s: io %.2f s (%.0f MB), rates %.2f s, transfer %.2f s, plot %.2f s'
+                             % (box, t.get('io', 0), t.get('bytes', 0) / 2.0**20, t.get('rates', 0),
+                                t.get('pack', 0) + t.get('pipe', 0) + t.get('unpack', 0),
+                                t.get('plot', 0)))
+            if self.units:
+                seconds, box, day = max(self.units)
+                lines.append('slowest: %s %s, %.2f s' % (box, day, seconds))
+            lines.append('run took %.2f s' % (time() - self.started))
+            return lines
+
+    def close(self):
+        """writes the closing record with the run's wall time"""
+        self._write({'done': True, 'seconds': time() - self.started})
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-resolution count rate of a box over a run of days, for drawing weeks of
+data at any zoom.
+
+The finest level is the background blocks of the DaySummary objects: the mean
+count rate of each 10 s block and the rates of its lowest and highest 2 ms bin.
+Each coarser level keeps, for each of its bins, the mean of the means, the
+lowest of the lows and the highest of the highs of the bins below it, so bursts
+and dropouts still show however far out the view is.
+
+The levels up to a whole day (DAY_LEVELS) are built for each day on its own:
+the blocks' from the summary when they are in view, the coarser ones once by
+day_levels(), in the worker that summarized the day. A RatePyramid only stacks
+the days' one bin levels and adds levels of LEVEL, LEVEL**2, ... days above them,
+so making one costs a few operations per day. view() returns the coarsest
+level that still has a bin per point of the plot, copying only the bins in
+view, so a draw costs about as many points as the plot is wide whatever span
+it covers.
+
+Blocks no summary covers are nan.
+"""
+
+import numpy as np
+
+from summary import SECOND, SPAN, DAY
+
+
+DAY_LEVELS = (int(SPAN), 60, 600, 3600, DAY)    #seconds per bin of the levels of one day
+LEVEL = 10          #bins of a level per bin of the next coarser one, above a day
+
+
+def _reduce(level, factor):
+    """returns the next coarser (mean, low, high) of a level"""
+    mean, low, high = level
+    n = -(-len(mean) // factor)
+    pad = n * factor - len(mean)
+    mean, low, high = [np.concatenate((a, np.full(pad, np.nan, dtype=a.dtype))).reshape(n, factor)
+                       for a in (mean, low, high)]
+    covered = np.isfinite(mean).sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        mean = np.where(covered > 0, np.nansum(mean, axis=1) / covered, np.nan).astype(low.dtype)
+    return mean, np.fmin.reduce(low, axis=1), np.fmax.reduce(high, axis=1)
+
+
+def block_level(summary):
+    """returns the (mean, low, high) of each block of a DaySummary's whole day, in counts
+    per second"""
+    at = int(round(summary.start / SPAN))
+    n = len(summary.counts)
+    mean, low, high = [np.full(DAY // DAY_LEVELS[0], np.nan, dtype=np.float32) for x in range(3)]
+    mean[at:at + n] = summary.counts / float(SPAN)
+    low[at:at + n] = summary.low.astype(np.float32) * SECOND
+    high[at:at + n] = summary.high.astype(np.float32) * SECOND
+    return mean, low, high
+
+
+def day_levels(summary):
+    """returns the (mean, low, high) of each of DAY_LEVELS but the blocks' over the whole
+    day of a DaySummary"""
+    levels = [block_level(summary)]
+    for step, below in zip(DAY_LEVELS[1:], DAY_LEVELS[:-1]):
+        levels.append(_reduce(levels[-1], step // below))
+    return levels[1:]
+
+
+class RatePyramid(object):
+
+    """The rate levels of a run of DaySummary objects, counts per second
+
+    summaries are the days of the run in order, None or -1 for days without
+    one, and offsets the seconds from the run's first day to each. steps[k] is
+    the seconds per bin of level k, the first starting at the run's start. The
+    levels of DAY_LEVELS are read from the days' own, those above from stacked.
+    """
+
+    def __init__(self, summaries, offsets):
+        self.offsets = np.asarray(offsets, dtype=np.float64)
+        self.seconds = int(self.offsets[-1]) + DAY if len(self.offsets) else 0
+        self.days = []
+        for summary in summaries:
+            if summary is None or summary == -1 or not len(summary.counts):
+                self.days.append(None)
+            elif summary.levels is None:
+                #extended by Watch since the worker built them
+                self.days.append((summary, day_levels(summary)))
+            else:
+                self.days.append((summary, summary.levels))
+        whole = [np.full(self.seconds // DAY, np.nan, dtype=np.float32) for x in range(3)]
+        for day, offset in zip(self.days, self.offsets):
+            if day is not None:
+                for a, b in zip(whole, day[1][-1]):
+                    a[int(offset // DAY)] = b[0]
+        self.stacked = [tuple(whole)]
+        self.steps = list(DAY_LEVELS)
+        while len(self.stacked[-1][0]) > LEVEL:
+            self.stacked.append(_reduce(self.stacked[-1], LEVEL))
+            self.steps.append(self.steps[-1] * LEVEL)
+
+    def __len__(self):
+        """seconds covered, with or without data"""
+        return self.seconds
+
+    def view(self, t0, t1, points):
+        """returns the bin starts, means, lows and highs between t0 and t1 seconds
+
+        at the finest level with no more than points bins in that span, or the
+        coarsest level if none has so few
+        """
+        k = 0
+        while k + 1 < len(self.steps) and (t1 - t0) / float(self.steps[k]) > points:
+            k += 1
+        step = self.steps[k]
+        top = len(DAY_LEVELS) - 1
+        size = self.seconds // step if k < top else len(self.stacked[k - top][0])
+        lo = int(np.clip(np.floor(t0 / step), 0, size))
+        hi = int(np.clip(np.ceil(t1 / step) + 1, lo, size))
+        if k >= top:
+            mean, low, high = [a[lo:hi] for a in self.stacked[k - top]]
+            return np.arange(lo, hi) * float(step), mean, low, high
+        mean, low, high = [np.full(hi - lo, np.nan, dtype=np.float32) for x in range(3)]
+        per_day = DAY // step
+        #only the days the span touches
+        for n in range(np.searchsorted(self.offsets, lo * step - DAY, 'right'), len(self.days)):
+            at = int(self.offsets[n] // step)
+            if at >= hi:
+                break
+            if self.days[n] is None:
+                continue
+            summary, levels = self.days[n]
+            a, b = max(lo, at), min(hi, at + per_day)
+            for out, level in zip((mean, low, high), levels[k-1] if k else block_level(summary)):
+                out[a - lo:b - lo] = level[a - at:b - at]
+        return np.arange(lo, hi) * float(step), mean, low, high
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Locating raw detector files for a box and day.
+
+Boxes are looked up under the data path either directly (path/LSU_01/) or one
+level down in a region directory (path/lsu/LSU_01/). The path may also be a
+single box directory, as described in info/help.txt. Each box directory holds
+dev1/ and dev2/, whose files (or sub-directories) carry the date in their name
+as either 2015_01_01 or 20150101.
+
+File locations are used by every reader, for cache keys and run costs. The
+rest of this module is the 'times' reader (see workers.run_rates), which reads
+raw files as flat arrays of TIME_DTYPE count timestamps, in seconds since the
+start of the file's day. That is not known to be the stations' own layout: it
+is for data converted to it and for bench.py's synthetic data. Files are
+memory mapped rather than read whole, and a sidecar <file>.idx of counts per
+second lets a short window of a day (one event at 20 us, say) be cut out by
+touching only the pages it lies on.
+"""
+
+from os import path, listdir
+import re
+from glob import glob
+from time import time
+
+import numpy as np
+
+
+DEVICES = ('dev1', 'dev2')
+TIME_DTYPE = np.dtype('<f8')
+INDEX_SUFFIX = '.idx'
+INDEX_STEP = 1.0        #seconds between entries of a raw file's time index
+INDEX_CHUNK = 2**22     #counts checked for time order at a time
+DATE = re.compile(r'\d{4}_\d{2}_\d{2}|\d{8}')      #the day in a raw file's name
+
+
+def box_dirs(path0, name):
+    """returns the directories under path0 holding the raw data of box name"""
+    path0 = path0.rstrip('/\\')
+    found = glob(path.join(path0, name)) + glob(path.join(path0, '*', name))
+    if path.basename(path0) == name:
+        found.append(path0)
+    return [x for x in found if path.isdir(x)]
+
+
+def day_files(path0, name, day):
+    """returns the sorted raw files of both devices of box name for day ('YYYY_MM_DD')"""
+    stamps = (day, day.replace('_', ''))
+    files = []
+    for box in box_dirs(path0, name):
+        for dev in DEVICES:
+            dev_dir = path.join(box, dev)
+            if not path.isdir(dev_dir):
+                continue
+            for entry in listdir(dev_dir):
+                if not any(stamp in entry for stamp in stamps):
+                    continue
+                full = path.join(dev_dir, entry)
+                if path.isdir(full):
+                    files.extend(path.join(full, x) for x in listdir(full))
+                else:
+                    files.append(full)
+    return sorted(x for x in files if path.isfile(x) and not x.endswith(INDEX_SUFFIX))
+
+
+def day_bytes(path0, name, days):
+    """returns the bytes of raw data of box name on each of days
+
+    Each device directory is listed once, however many days, so the cost of a
+    run's work units can be estimated before any of them start.
+    """
+    index = {}
+    for n, day in enumerate(days):
+        index[day] = n
+        index[day.replace('_', '')] = n
+    sizes = [0 for day in days]
+    for box in box_dirs(path0, name):
+        for dev in DEVICES:
+            dev_dir = path.join(box, dev)
+            if not path.isdir(dev_dir):
+                continue
+            for entry in listdir(dev_dir):
+                match = DATE.search(entry)
+                n = index.get(match.group(0)) if match else None
+                if n is None or entry.endswith(INDEX_SUFFIX):
+                    continue
+                full = path.join(dev_dir, entry)
+                files = [path.join(full, x) for x in listdir(full)] if path.isdir(full) else [full]
+                for f in files:
+                    if not f.endswith(INDEX_SUFFIX) and path.isfile(f):
+                        sizes[n] += path.getsize(f)
+    return sizes
+
+
+def device(filename):
+    """returns the device directory (one of DEVICES) filename is under, None if there is none"""
+    head, tail = path.split(path.dirname(filename))
+    while tail:
+        if tail in DEVICES:
+            return tail
+        head, tail = path.split(head)
+    return None
+
+
+def fingerprint(files):
+    """returns (file, size, mtime) for each file, changes whenever one of them is edited"""
+    stamp = []
+    for f in files:
+        try:
+            st = path.getsize(f), path.getmtime(f)
+        except OSError:
+            continue
+        stamp.append((f, st[0], st[1]))
+    return tuple(stamp)
+
+
+class RawFile(object):
+
+    """One raw file mapped read-only, with a coarse index of its count times
+
+    offsets[k] is the number of counts before second start + k (in steps of
+    INDEX_STEP), so a window of the file is found without reading the rest of it.
+    The index is built on first touch and saved beside the file as <file>.idx,
+    stamped with the file's size and mtime. When a file has grown since, only
+    the appended counts are indexed, as raw files are only ever appended to.
+    Files that aren't in time order are sorted in memory and their index isn't saved.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.size = path.getsize(filename)
+        if self.size < TIME_DTYPE.itemsize:
+            self.times = np.zeros(0, dtype=TIME_DTYPE)
+        else:
+            self.times = np.memmap(filename, dtype=TIME_DTYPE, mode='r',
+                                   shape=(self.size // TIME_DTYPE.itemsize,))
+        index = self._load_index()
+        if index is None:
+            index = self._build_index()
+        self.start, self.offsets = index
+
+    def __len__(self):
+        return len(self.times)
+
+    def end(self):
+        """returns the last count time in the file, -inf if it is empty"""
+        return float(self.times[-1]) if len(self.times) else -np.inf
+
+    def _stamp(self):
+        return [self.size, int(path.getmtime(self.filename) * 1000)]
+
+    def _ordered(self, first=0):
+        """True if the counts from first on are in time order"""
+        for i in range(first, len(self.times), INDEX_CHUNK):
+            #overlap by one so the order across chunk edges is checked too
+            if (np.diff(self.times[max(i - 1, 0):i + INDEX_CHUNK]) < 0).any():
+                return False
+        return True
+
+    def _save_index(self, start, offsets):
+        try:
+            np.concatenate((self._stamp(), [start], offsets)).astype(np.int64) \
+                .tofile(self.filename + INDEX_SUFFIX)
+        except (IOError, OSError):
+            #read-only data, keep the index in memory only
+            pass
+
+    def _load_index(self):
+        try:
+            index = np.fromfile(self.filename + INDEX_SUFFIX, dtype=np.int64)
+        except (IOError, OSError):
+            return None
+        if len(index) < 4:
+            return None
+        start, offsets = int(index[2]), index[3:]
+        if list(index[:2]) == self._stamp():
+            return start, offsets
+        known = int(index[0]) // TIME_DTYPE.itemsize
+        if not 0 < known < len(self.times) or not self._ordered(known):
+            return None
+        #appended to since it was indexed, entries before the old last one still hold
+        first = start + len(offsets) - 1
+        stop = max(int(np.floor(self.times[-1] / INDEX_STEP)) + 1, first)
+        new = np.searchsorted(self.times, INDEX_STEP * np.arange(first, stop + 1))
+        offsets = np.concatenate((offsets[:-1], new)).astype(np.int64)
+        self._save_index(start, offsets)
+        return start, offsets
+
+    def _build_index(self):
+        times = self.times
+        if not len(times):
+            return 0, np.zeros(1, dtype=np.int64)
+        ordered = self._ordered()
+        if not ordered:
+            self.times = times = np.sort(times, kind='mergesort')
+        start = int(np.floor(times[0] / INDEX_STEP))
+        stop = int(np.floor(times[-1] / INDEX_STEP)) + 1
+        offsets = np.searchsorted(times, INDEX_STEP * np.arange(start, stop + 1)).astype(np.int64)
+        if ordered:
+            self._save_index(start, offsets)
+        return start, offsets
+
+    def window(self, lo, hi):
+        """returns a copy of the count times lo <= t < hi, reading only the pages holding them"""
+        last = len(self.offsets) - 1
+        a = int(np.clip(np.floor(lo / INDEX_STEP) - self.start, 0, last))
+        b = int(np.clip(np.floor(hi / INDEX_STEP) - self.start + 1, 0, last))
+        part = self.times[self.offsets[a]:self.offsets[b]]
+        i, j = np.searchsorted(part, [lo, hi])
+        return np.array(part[i:j])
+
+
+class DayData(object):
+
+    """The raw files of one box and day, read as a single sorted stream of count times
+
+    check, if given, is called before each file is opened and may raise to stop.
+    bytes and seconds add up the raw data read and the time spent opening and
+    reading the files.
+    """
+
+    def __init__(self, files, check=None):
+        self.files = []
+        self.bytes = 0
+        self.seconds = 0.0
+        for f in files:
+            if check is not None:
+                check()
+            start = time()
+            self.files.append(RawFile(f))
+            self.seconds += time() - start
+
+    def __len__(self):
+        return sum(len(f) for f in self.files)
+
+    def end(self):
+        """returns the time up to which every device has written data, -inf if one has none"""
+        ends = {}
+        for f in self.files:
+            dev = device(f.filename)
+            ends[dev] = max(ends.get(dev, -np.inf), f.end())
+        return min(ends.values()) if ends else -np.inf
+
+    def window(self, lo, hi):
+        """returns the sorted count times lo <= t < hi of all files combined"""
+        start = time()
+        parts = [f.window(lo, hi) for f in self.files]
+        if not parts:
+            return np.zeros(0, dtype=TIME_DTYPE)
+        times = np.concatenate(parts)
+        times.sort(kind='mergesort')
+        self.bytes += times.nbytes
+        self.seconds += time() - start
+        return times
+
+
+def read_times(files, check=None):
+    """returns the sorted count timestamps of all files combined
+
+    check, if given, is called before each file and may raise to stop reading
+    """
+    return DayData(files, check).window(-np.inf, np.inf)
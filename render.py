@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Turning long histograms into few enough points to draw quickly.
+
+A histogram with more bins than the axes have pixel columns is drawn as one
+line through the minimum and maximum of the bins in each column, which looks
+the same on screen as drawing every bin. Zooming in brings back individual bins.
+
+HistogramPlot keeps the artists of one axes and updates them in place. It only
+uses the axes it is given, so the GUI's canvases and headless Agg figures (see
+bench.py) draw the same way.
+"""
+
+import numpy as np
+
+
+def decimate(counts, edges, width, lo, hi, pixels):
+    """returns the x, y and drawstyle of a line showing the bins between lo and hi
+
+    edges are the left edges of counts. Below one bin per pixel the line is a
+    plain step histogram, above it each pixel column becomes a vertical stroke
+    from the lowest to the highest count among its bins.
+    """
+    n = len(counts)
+    i0 = int(np.clip(np.floor((lo - edges[0]) / width), 0, n - 1))
+    i1 = int(np.clip(np.ceil((hi - edges[0]) / width), i0 + 1, n))
+    sub = counts[i0:i1]
+    pixels = max(int(pixels), 1)
+    if len(sub) <= pixels:
+        x = np.append(edges[i0:i1], edges[i1-1] + width)
+        y = np.append(sub, sub[-1])
+        return x, y, 'steps-post'
+    k = int(np.ceil(len(sub) / float(pixels)))
+    pad = (-len(sub)) % k
+    groups = np.concatenate((sub, np.repeat(sub[-1], pad))).reshape(-1, k)
+    x = np.repeat(edges[i0] + width * k * np.arange(len(groups)), 2)
+    y = np.empty(len(x), dtype=counts.dtype)
+    y[0::2] = groups.min(axis=1)
+    y[1::2] = groups.max(axis=1)
+    return x, y, 'default'
+
+
+class HistogramPlot(object):
+
+    """The histogram artists of one axes, kept and updated in place
+
+    Every histogram is drawn as a single line, a step histogram or decimated to
+    the width of the axes, and refined whenever the view is zoomed or panned.
+    Histograms longer than VIEW_BINS bins open on the VIEW_BINS bins around the
+    event, or around their highest bin if their edges aren't relative to it. Changing the data of one line keeps page flips cheap, hundreds of bar
+    patches took about three times as long to draw.
+    """
+
+    VIEW_BINS = 500
+
+    def __init__(self, ax):
+        self.ax = ax
+        self.line = None
+        self.hist = None
+        self.ax.callbacks.connect('xlim_changed', self.refine)
+
+    def clear(self):
+        if self.line is not None:
+            self.line.remove()
+            self.line = None
+        self.hist = None
+
+    def plot(self, hist, width):
+        """shows hist ([counts, left edges relative to the event]) at bin width"""
+        counts, edges = hist
+        if self.line is None:
+            self.line, = self.ax.plot([], [])
+        self.hist = counts, edges, width
+        if len(counts) > self.VIEW_BINS:
+            #edges relative to the event cover 0, rates()' own are centred on the peak
+            first, last = edges[0], edges[-1] + width
+            center = 0.0 if first <= 0 < last else edges[np.argmax(counts)] + width / 2.0
+            span = width * self.VIEW_BINS
+            lo = min(max(center - span / 2.0, first), last - span)
+            hi = lo + span
+        else:
+            lo, hi = edges[0], edges[-1] + width
+        self.ax.set_ylim(0, max(counts.max(), 1) * 1.05)
+        self.ax.set_xlim(lo, hi)
+        self.refine(self.ax)
+
+    def refine(self, ax=None):
+        """redoes the line for the visible range, called whenever the x limits change"""
+        if self.hist is None:
+            return
+        counts, edges, width = self.hist
+        lo, hi = self.ax.get_xlim()
+        x, y, style = decimate(counts, edges, width, lo, hi,
+                               self.ax.get_window_extent().width)
+        self.line.set_drawstyle(style)
+        self.line.set_data(x, y)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Passing day summaries from worker processes to the GUI without pickling them.
+
+A worker writes the numeric arrays of a DaySummary (block counts, variances,
+lowest and highest 2 ms counts, rate levels, the histograms of events that
+carry their own and the raw times of every event) into one flat file in the
+pool's buffer directory and sends back a small Packed descriptor. The GUI maps the file read-only and builds the summary as views over the
+mapping, so the arrays are neither pickled nor copied.
+"""
+
+import os
+from os import path
+
+import numpy as np
+
+from events import Event
+from summary import DaySummary, DAY
+from pyramid import DAY_LEVELS
+
+
+class Packed(object):
+
+    """Descriptor of a DaySummary written to a buffer file
+
+    events holds (t0, sigma, avg, minimum, date, start, stop, hists) for each
+    event, where start:stop is its slice of the packed event times and hists
+    the (width, at, bins) of each of its own histograms, whose counts and edges
+    are bins float64 values each from at in the packed histograms. levels is
+    True if the summary's rate levels were written, hist_items is the length of
+    the histograms.
+    start and done are the seconds of the day the summary covers. stats are the
+    timings of the work unit that made it, see metrics.py.
+    """
+
+    def __init__(self, file, name, day, blocks, levels, hist_items, events, start, done):
+        self.file = file
+        self.name = name
+        self.day = day
+        self.blocks = blocks
+        self.levels = levels
+        self.hist_items = hist_items
+        self.events = events
+        self.start = start
+        self.done = done
+        self.stats = None
+
+
+def pack(summary, directory, tag):
+    """writes summary's arrays to a buffer file in directory, returns its Packed descriptor"""
+    f = path.join(directory, '%d_%s.buf' % (os.getpid(), tag))
+    events = []
+    start = 0
+    at = 0
+    with open(f, 'wb') as fh:
+        summary.counts.astype(np.int32).tofile(fh)
+        summary.variance.astype(np.float32).tofile(fh)
+        summary.low.astype(np.uint16).tofile(fh)
+        summary.high.astype(np.uint16).tofile(fh)
+        #the float64 histograms must start on 8 bytes
+        _pad(fh)
+        if summary.levels is not None:
+            for level in summary.levels:
+                for a in level:
+                    a.astype(np.float32).tofile(fh)
+            _pad(fh)
+        hists = []
+        for e in summary.events:
+            spans = []
+            for width in sorted(e.hists):
+                counts, edges = e.hists[width]
+                bins = len(counts)
+                np.asarray(counts, dtype=np.float64).tofile(fh)
+                np.asarray(edges, dtype=np.float64)[:bins].tofile(fh)
+                spans.append((width, at, bins))
+                at += 2 * bins
+            hists.append(spans)
+        for e, spans in zip(summary.events, hists):
+            e.times.astype(np.float32).tofile(fh)
+            events.append((e.t0, e.sigma, e.avg, e.minimum, e.date, start, start + len(e.times),
+                           spans))
+            start += len(e.times)
+    return Packed(f, summary.name, summary.day, len(summary.counts), summary.levels is not None,
+                  at, events, summary.start, summary.done)
+
+
+def _pad(fh):
+    fh.write(b'\0' * (-fh.tell() % 8))
+
+
+def unpack(packed):
+    """maps a buffer file and returns its DaySummary as views over the mapping"""
+    buf = np.memmap(packed.file, dtype=np.uint8, mode='r')
+    n = packed.blocks
+    counts = buf[:4*n].view(np.int32)
+    variance = buf[4*n:8*n].view(np.float32)
+    low = buf[8*n:10*n].view(np.uint16)
+    high = buf[10*n:12*n].view(np.uint16)
+    at = 12*n + (-12*n % 8)
+    levels = None
+    if packed.levels:
+        levels = []
+        for step in DAY_LEVELS[1:]:
+            m = 4 * (DAY // step)
+            levels.append(tuple(buf[at + k*m:at + (k+1)*m].view(np.float32) for k in range(3)))
+            at += 3*m
+        at += -at % 8
+    hists = buf[at:at + 8*packed.hist_items].view(np.float64)
+    times = buf[at + 8*packed.hist_items:].view(np.float32)
+    events = [Event(t0, times[start:stop], sigma, avg, date, minimum,
+                    dict((width, [hists[a:a + bins], hists[a + bins:a + 2*bins]])
+                         for width, a, bins in spans))
+              for t0, sigma, avg, minimum, date, start, stop, spans in packed.events]
+    try:
+        #the mapping outlives the file where the OS allows it, otherwise sweep() removes it later
+        os.remove(packed.file)
+    except OSError:
+        pass
+    spans = [(start, stop) for t0, sigma, avg, minimum, date, start, stop, own in packed.events]
+    return DaySummary(packed.name, packed.day, counts, variance, events, times, spans,
+                      packed.start, packed.done, low, high, levels)
+
+
+def sweep(directory):
+    """removes the buffer files in directory that are no longer mapped"""
+    for name in os.listdir(directory):
+        try:
+            os.remove(path.join(directory, name))
+        except OSError:
+            pass
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+The boxes of the TETRA-II array, grouped by region in box tree order.
+"""
+
+REGIONS = [('LSU', ['LSU_01', 'LSU_02']),
+           ('Huntsville', ['UAH_01', 'UAH_02']),
+           ('Puerto Rico', ['PR_0%d' % (x+1) for x in range(9)] + ['PR_10']),
+           ('Panama', ['PA_0%d' % (x+1) for x in range(5)])]
+
+BOXES = [box for region, boxes in REGIONS for box in boxes]
+REGION_OF = dict((box, region) for region, boxes in REGIONS for box in boxes)
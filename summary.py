@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Per-day summary of a box's count rate, used to pick out events at any
+threshold without going back to the raw data.
+
+By default the events are those plot_hists_gui3.rates() finds at the run's
+threshold, see from_rates(). rates() doesn't hand out the background it
+measured them against or their sigma, so such summaries have no block
+statistics and only hold the events of that one threshold.
+
+With the 'times' reader (see workers.run_rates) the summary is built from raw
+files of flat count times instead, see rawdata.py. Counts are binned at BIN
+(2 ms) and each bin is compared with the mean and variance of the BLOCK 2 ms
+bins (10 s) before it, see trigger.py. Every group of bins at least FLOOR sigma
+over the background is kept as a candidate Event along with its raw count
+times. Since FLOOR is the lowest value on the threshold slider, any threshold
+can then be applied as a cut on the candidates' peak sigma.
+
+Every block also keeps its lowest and highest 2 ms count, the finest level of
+the rate curve a pyramid.RatePyramid draws.
+"""
+
+import numpy as np
+
+from events import Event, WINDOW, date, time_of_day, untimed
+from trigger import trigger
+
+
+BIN = 0.002             #seconds, trigger bin size
+FINE_BIN = 0.00002      #seconds, the bin size of rates()' fine histograms
+BLOCK = 5000            #2 ms bins per background block (10 s)
+CHUNK = 600             #seconds of data binned at a time
+FLOOR = 10              #lowest threshold (in sigma) candidates are kept for
+DAY = 86400
+SPAN = BLOCK * BIN      #seconds per background block
+SECOND = int(round(1 / BIN))    #2 ms bins per second
+
+
+class DaySummary(object):
+
+    """Background statistics and candidate events of one box for one day
+
+    counts and variance hold, for each background block of the day, the total
+    counts and the variance of its 2 ms counts. events are the candidates in time
+    order and sigma their peak significance. When the events' raw times are
+    slices of one buffer, times is that buffer and spans their (start, stop).
+    The blocks cover start to done seconds of the day, done is short of DAY
+    while the day's data is still being written. low and high are the lowest
+    and highest 2 ms count of each block, and levels the day's rate levels
+    (see pyramid.day_levels()) if they were built. Summaries made by
+    from_rates() have no blocks. stats holds the timings of the work unit that made the summary, if it came
+    from a WorkerPool.
+    """
+
+    def __init__(self, name, day, counts, variance, events, times=None, spans=None,
+                 start=0, done=DAY, low=None, high=None, levels=None):
+        self.name = name
+        self.day = day
+        self.counts = counts
+        self.variance = variance
+        self.events = events
+        self.sigma = np.array([e.sigma for e in events], dtype=np.float32)
+        self.times = times
+        self.spans = spans
+        self.start = start
+        self.done = done
+        self.low = np.zeros(len(counts), dtype=np.uint16) if low is None else low
+        self.high = np.zeros(len(counts), dtype=np.uint16) if high is None else high
+        self.levels = levels
+        self.stats = None
+
+    def __len__(self):
+        return len(self.events)
+
+    def mean(self):
+        """returns the mean 2 ms count of each background block"""
+        return self.counts / float(BLOCK)
+
+    def select(self, threshold):
+        """returns the candidate events at or above threshold sigma"""
+        return [self.events[i] for i in np.flatnonzero(self.sigma >= threshold)]
+
+    def extend(self, part):
+        """returns this summary followed by part, the summary of the blocks after done"""
+        return DaySummary(self.name, self.day, np.concatenate((self.counts, part.counts)),
+                          np.concatenate((self.variance, part.variance)),
+                          list(self.events) + list(part.events), start=self.start, done=part.done,
+                          low=np.concatenate((self.low, part.low)),
+                          high=np.concatenate((self.high, part.high)))
+
+
+def from_rates(name, day, data2m, data20u, info, threshold, done=DAY):
+    """builds the DaySummary of one day of plot_hists_gui3.rates() output at threshold
+
+    rates() returns, for each event, its 2 ms and 20 us histograms and its
+    (ave, min, date), which are kept as they are. It doesn't return the sigma
+    of an event, so each is given the threshold rates() was run at, the least
+    it can be. Events whose date has no time of day are given an
+    events.untimed() t0. done is the seconds of the day rates() could read.
+    """
+    events = []
+    for n, (hist2m, hist20u, item) in enumerate(zip(data2m, data20u, info)):
+        avg, minimum, when = item[0], item[1], item[2]
+        t0 = time_of_day(when)
+        if np.isnan(t0):
+            t0 = untimed(n)
+        events.append(Event(t0, np.zeros(0, dtype=np.float32), float(threshold),
+                            avg, when, minimum, {BIN: hist2m, FINE_BIN: hist20u}))
+    return DaySummary(name, day, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32),
+                      events, done=done)
+
+
+def live_stop(end):
+    """returns the block boundary a pass may go up to when the data so far ends at end
+
+    the last WINDOW seconds are left for later, so events near the end get all their raw times
+    """
+    return int(np.clip((end - WINDOW) // SPAN, 0, DAY // SPAN) * SPAN)
+
+
+def make_event(day, data, t0, sigma, avg, minimum):
+    """cuts the raw times within WINDOW of t0 out of a day's data into an Event"""
+    times = data.window(t0 - WINDOW, t0 + WINDOW)
+    return Event(t0, (times - t0).astype(np.float32), float(sigma), float(avg),
+                 date(day, t0), int(minimum))
+
+
+def scan(day, data, counts, variance, check=None, start=0, stop=DAY, low=None, high=None):
+    """yields the candidate Events of a day's count times as they are found
+
+    data is a rawdata.DayData, read one CHUNK at a time from start to stop
+    seconds (both block boundaries). counts and variance are filled in with the
+    statistics of those blocks on the way, and low and high, if given, with the
+    lowest and highest 2 ms count of each. check, if given, is called
+    before each chunk and may raise to stop the pass.
+
+    Each chunk is binned with the BLOCK bins before it, which the trigger uses as
+    background for its first bins, and WINDOW seconds after it, so candidates
+    near its end get their full minimum. The first block of the day has nothing
+    before it and is used as its own background. A chunk only reports the runs
+    that start inside it: those starting after it are the next chunk's, and the
+    bin just before it is scored too, so a run already going there is left to
+    the chunk (or the earlier pass) it started in.
+    """
+    reach = int(round(WINDOW / BIN))
+    lead = BLOCK + 1        #background bins and the bin before the chunk
+    for t in range(int(start), int(stop), CHUNK):
+        if check is not None:
+            check()
+        end = min(t + CHUNK, stop)
+        lo = t - SPAN
+        n = int(round((end + WINDOW - lo) / BIN)) + 1
+        chunk = data.window(max(lo - BIN, 0), end + WINDOW)
+        binned = np.bincount(np.floor((chunk - lo) / BIN).astype(np.int64) + 1, minlength=n)[:n]
+        if t < SPAN:
+            binned = np.concatenate(([0], binned[lead:lead + BLOCK], binned[lead:]))
+        core = int(round((end - t) / BIN))
+        blocks = binned[lead:lead + core].reshape(-1, BLOCK)
+        first = int(round((t - start) / SPAN))
+        counts[first:first + len(blocks)] = blocks.sum(axis=1)
+        variance[first:first + len(blocks)] = blocks.var(axis=1)
+        if low is not None:
+            low[first:first + len(blocks)] = np.minimum(blocks.min(axis=1), 0xffff)
+            high[first:first + len(blocks)] = np.minimum(blocks.max(axis=1), 0xffff)
+        found = trigger(binned, BLOCK, FLOOR, reach)
+        for k in np.flatnonzero((found.start >= lead) & (found.start < lead + core)):
+            yield make_event(day, data, t + (found.peak[k] - lead) * BIN,
+                             found.sigma_peak[k], found.avg[k], found.minimum[k])
+
+
+def summarize(name, day, data, check=None, emit=None, stop=DAY, start=0):
+    """builds the DaySummary of a day's count times (a rawdata.DayData) from start to stop
+
+    A start after 0, the done of an earlier summary of the day, makes it a summary
+    of only the blocks after that one, measured against the same background the
+    earlier pass would have carried on with. emit, if given, is called with each
+    Event as soon as scan() finds it
+    """
+    stop = max(stop, start)
+    blocks = int(round((stop - start) / SPAN))
+    counts = np.zeros(blocks, dtype=np.int32)
+    variance = np.zeros(blocks, dtype=np.float32)
+    low = np.zeros(blocks, dtype=np.uint16)
+    high = np.zeros(blocks, dtype=np.uint16)
+    events = []
+    for event in scan(day, data, counts, variance, check, start, stop, low, high):
+        events.append(event)
+        if emit is not None:
+            emit(event)
+    return DaySummary(name, day, counts, variance, events, start=start, done=stop,
+                      low=low, high=high)
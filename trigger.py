@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+The trigger kernel: background rate, significance and candidate windows of a
+run of binned counts.
+
+Each bin is measured against the mean and variance of the window bins just
+before it. Those rolling statistics come from running sums of the counts and
+their squares, so a pass is a few array operations however long the window.
+Runs of neighbouring bins at least floor sigma over their background are the
+candidate windows.
+
+Most bins of most days are nowhere near floor. A coarse screen first bounds
+the best score of each SEGMENT bins from the running sums at its ends and its
+highest count, and only the segments that could reach floor are scored bin by
+bin, so quiet stretches cost one pass of sums and maxima.
+
+Two backends compute the same scores: plain NumPy, and a Numba compiled loop
+that avoids the temporary arrays. Numba is used when it can be imported;
+set_backend() picks one explicitly, for benchmarks say.
+
+This module only needs NumPy, workers import it on start up.
+"""
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+MIN_VARIANCE = 1.0      #variance floor, keeps near empty backgrounds from triggering on single counts
+SEGMENT = 50            #bins per segment of the coarse screen, 0 scores every bin
+
+
+class Trigger(object):
+
+    """Result of trigger() on counts
+
+    start, stop and peak are the bins (indices into counts) of each candidate
+    window and its most significant bin; sigma_peak, avg and minimum its peak
+    significance, background mean and lowest count within reach bins of the
+    peak. scored is how many bins were measured against their background.
+    """
+
+    def __init__(self, start, stop, peak, sigma_peak, avg, minimum, scored):
+        self.start = start
+        self.stop = stop
+        self.peak = peak
+        self.sigma_peak = sigma_peak
+        self.avg = avg
+        self.minimum = minimum
+        self.scored = scored
+
+    def __len__(self):
+        return len(self.peak)
+
+
+def _score_numpy(counts, total, squares, window, bins):
+    if len(bins) and bins[-1] - bins[0] + 1 == len(bins):
+        #slices are much cheaper than gathers when the bins are one run
+        bins = slice(bins[0], bins[-1] + 1)
+        ahead = slice(bins.start + window, bins.stop + window)
+    else:
+        ahead = bins + window
+    #sums over the window bins before each of bins (indices from counts[window] on)
+    s = total[ahead] - total[bins]
+    s2 = squares[ahead] - squares[bins]
+    mean = s / float(window)
+    sigma = np.sqrt(np.maximum(s2 / float(window) - mean ** 2, MIN_VARIANCE))
+    return (counts[ahead] - mean) / sigma
+
+
+def _minimum_numpy(counts, peak, reach):
+    return np.array([counts[max(p - reach, 0):p + reach].min() for p in peak], dtype=np.int64)
+
+
+if numba is not None:
+
+    @numba.njit(cache=True)
+    def _score_numba(counts, total, squares, window, bins):
+        score = np.empty(len(bins))
+        for k in range(len(bins)):
+            i = bins[k]
+            m = (total[i + window] - total[i]) / window
+            sd = np.sqrt(max((squares[i + window] - squares[i]) / window - m * m, MIN_VARIANCE))
+            score[k] = (counts[i + window] - m) / sd
+        return score
+
+    @numba.njit(cache=True)
+    def _minimum_numba(counts, peak, reach):
+        out = np.empty(len(peak), dtype=np.int64)
+        for k in range(len(peak)):
+            lo = max(peak[k] - reach, 0)
+            hi = min(peak[k] + reach, len(counts))
+            m = counts[lo]
+            for i in range(lo + 1, hi):
+                if counts[i] < m:
+                    m = counts[i]
+            out[k] = m
+        return out
+
+_BACKENDS = {'numpy': (_score_numpy, _minimum_numpy)}
+if numba is not None:
+    _BACKENDS['numba'] = (_score_numba, _minimum_numba)
+BACKEND = 'numba' if numba is not None else 'numpy'
+
+
+def set_backend(name):
+    """uses backend name ('numpy' or 'numba') from now on, raises ValueError if it isn't available"""
+    global BACKEND
+    if name not in _BACKENDS:
+        raise ValueError('trigger backend %r is not available' % name)
+    BACKEND = name
+
+
+def prefix_sums(counts):
+    """returns the running sums of counts and of their squares, each starting with 0"""
+    total = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+    squares = np.concatenate(([0], np.cumsum(counts * counts, dtype=np.int64)))
+    return total, squares
+
+
+def screen(counts, total, squares, window, floor, segment=SEGMENT):
+    """returns which segments of counts[window:] may hold a bin scoring floor or more
+
+    The background sums of a segment's bins differ from those of its first bin
+    by at most the counts entering and leaving the window across the segment,
+    which bounds their means from below and their variances from below. The
+    segment's highest count against those bounds is the most any of its bins
+    can score, so the segments returned False need no closer look.
+    """
+    n = len(counts) - window
+    a = np.arange(0, n, segment)
+    b = np.minimum(a + segment, n) - 1      #last bin of each segment
+    s = total[a + window] - total[a]
+    s2 = squares[a + window] - squares[a]
+    high = (s + total[b + window] - total[a + window]) / float(window)
+    low = (s - (total[b] - total[a])) / float(window)
+    var = (s2 - (squares[b] - squares[a])) / float(window) - high ** 2
+    sigma = np.sqrt(np.maximum(var, MIN_VARIANCE))
+    top = np.maximum.reduceat(counts[window:], a)
+    #a hair under floor so rounding can't drop a segment the exact score puts on it
+    return top - low >= (floor - 1e-6) * sigma
+
+
+def background(counts, window, bins=None):
+    """returns the background mean, sigma and score of bins (indices from counts[window] on)
+
+    Each bin is measured against the mean and variance of the window bins
+    before it, every bin from counts[window] on if bins is None.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    if bins is None:
+        bins = np.arange(len(counts) - window)
+    bins = np.asarray(bins, dtype=np.int64)
+    total, squares = prefix_sums(counts)
+    mean = (total[bins + window] - total[bins]) / float(window)
+    sigma = np.sqrt(np.maximum((squares[bins + window] - squares[bins]) / float(window) - mean ** 2,
+                               MIN_VARIANCE))
+    return mean, sigma, _BACKENDS[BACKEND][0](counts, total, squares, window, bins)
+
+
+def windows(score, floor):
+    """returns the start, stop and peak indices of the runs of score at or above floor"""
+    hot = np.concatenate(([False], score >= floor, [False]))
+    edges = np.diff(hot.astype(np.int8))
+    start = np.flatnonzero(edges == 1)
+    stop = np.flatnonzero(edges == -1)
+    if not start.size:
+        return start, stop, start
+    #the first bin of each run that reaches the run's highest score
+    top = np.maximum.reduceat(score, start)
+    run = np.cumsum(edges[:-1] == 1) - 1
+    bins = np.flatnonzero(hot[1:-1])
+    bins = bins[score[bins] == top[run[bins]]]
+    first = np.unique(run[bins], return_index=True)[1]
+    return start, stop, bins[first]
+
+
+def trigger(counts, window, floor, reach=0, segment=SEGMENT):
+    """runs the trigger over counts (counts per bin) and returns a Trigger
+
+    The first window bins only serve as background for the ones after them.
+    reach is how far either side of a peak its minimum is looked for. Unless
+    segment is 0, a coarse screen() of segment bins at a time picks the bins
+    worth scoring; the candidates are the same either way.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    n = len(counts) - window
+    total, squares = prefix_sums(counts)
+    if segment:
+        hot = screen(counts, total, squares, window, floor, segment)
+        bins = np.flatnonzero(np.repeat(hot, segment)[:n])
+    else:
+        bins = np.arange(n)
+    #bins left out can't reach floor, so runs never cross them
+    score = np.full(n, -np.inf)
+    score[bins] = _BACKENDS[BACKEND][0](counts, total, squares, window, bins)
+    start, stop, peak = windows(score, floor)
+    avg = (total[peak + window] - total[peak]) / float(window)
+    if reach > 0 and peak.size:
+        minimum = _BACKENDS[BACKEND][1](counts, peak + window, reach)
+    else:
+        minimum = counts[peak + window]
+    return Trigger(start + window, stop + window, peak + window, score[peak], avg, minimum,
+                   len(bins))
@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent pool of worker processes used to run the rates pass off the GUI
+thread.
+
+This module must not import Qt or matplotlib, nor may the modules its
+workers use (summary, rawdata, pyramid, sharedbuf, ...): worker processes
+import them on start up, and keeping them light keeps process spawn cheap.
+"""
+
+import os
+import multiprocessing as mp
+import threading
+import cProfile
+import pickle
+import tempfile
+import shutil
+import heapq
+from datetime import datetime, timedelta
+try:
+    from Queue import Empty
+except ImportError:
+    from queue import Empty
+from time import time
+
+from sharedbuf import pack, unpack, sweep
+from summary import DAY
+
+
+EVENT = 0
+DONE = 1
+
+POLL = 1.0          #seconds between checks that the workers are alive
+
+RATES = 'rates'     #events from plot_hists_gui3.rates()
+TIMES = 'times'     #the summary pass over raw files of flat count times
+READERS = (RATES, TIMES)
+
+
+class RatesError(Exception):
+
+    """Raised when exceptions are caught in run_rates()"""
+
+    pass
+
+
+class Cancelled(Exception):
+
+    """Raised inside a worker when its work unit was cancelled"""
+
+    pass
+
+
+def run_rates(name, day, path, start=0, threshold=None, check=None, emit=None, stats=None,
+              reader=RATES):
+    """summarizes one day of box name, returns (DaySummary, errors)
+
+    With the RATES reader the summary holds the events plot_hists_gui3.rates()
+    finds for the day at threshold (summary.FLOOR if None), see
+    summary.from_rates(), and a new threshold means running it again. rates()
+    always reads a whole day, so start is ignored and a day that isn't over yet
+    is summarized again in full each time.
+
+    With the TIMES reader the raw files are read as flat count times (see
+    rawdata.py) and a day that isn't over yet is summarized up to the end of the
+    data written so far. start, the done of an earlier summary of the day,
+    limits the pass to the data after it, and emit is called with each event as
+    it is found. The summary holds candidates down to summary.FLOOR whatever
+    threshold is, DaySummary.select() applies the actual one.
+
+    check is called between files and chunks, see WorkerPool.cancel(). The io,
+    bytes and rates timings of metrics.py are put in stats, if given.
+    """
+    began = time()
+    if reader == RATES:
+        from plot_hists_gui3 import rates
+        from summary import from_rates, FLOOR
+        if check is not None:
+            check()
+        stop = DAY if day_over(day) else day_seconds(day)
+        threshold = FLOOR if threshold is None else threshold
+        data2m, data20u, info, errors = rates(box_num=name, start_date=day, duration=1,
+                                              threshold=threshold, path0=path)
+        if stats is not None:
+            stats['rates'] = time() - began
+        return from_rates(name, day, data2m, data20u, info, threshold, stop), list(errors)
+    from rawdata import day_files, DayData
+    from summary import summarize, live_stop
+    from pyramid import day_levels
+    files = day_files(path, name, day)
+    errors = []
+    if not files and not start:
+        errors.append('%s %s: no raw data found' % (name, day))
+    data = DayData(files, check)
+    stop = DAY if day_over(day) else live_stop(data.end())
+    summary = summarize(name, day, data, check, emit, stop, start)
+    summary.levels = day_levels(summary)
+    if stats is not None:
+        stats['io'] = data.seconds
+        stats['bytes'] = data.bytes
+        stats['rates'] = time() - began - data.seconds
+    return summary, errors
+
+
+def day_over(day):
+    """True once the whole of day ('YYYY_MM_DD', UTC) is in the past"""
+    return datetime.strptime(day, '%Y_%m_%d') + timedelta(days=1) <= datetime.utcnow()
+
+
+def day_seconds(day):
+    """returns the seconds of day ('YYYY_MM_DD', UTC) that have passed, 0 to DAY"""
+    passed = datetime.utcnow() - datetime.strptime(day, '%Y_%m_%d')
+    return int(min(max(passed.days * DAY + passed.seconds, 0), DAY))
+
+
+def split_days(date, duration):
+    """returns the 'YYYY_MM_DD' date of each day in a run, in order"""
+    start = datetime.strptime(date, '%Y_%m_%d')
+    return [(start + timedelta(days=x)).strftime('%Y_%m_%d') for x in range(duration)]
+
+
+def _picklable(inst):
+    """returns inst, or a RatesError carrying its message if inst can't cross a process boundary"""
+    try:
+        pickle.dumps(inst)
+        return inst
+    except Exception:
+        return RatesError('%s: %s' % (type(inst).__name__, inst))
+
+
+def run_cached(cache, args, check=None, emit=None, stats=None, reader=RATES):
+    """runs run_rates(*args), going through cache (a ResultCache or None)
+
+    emit is only called on a cache miss, a hit returns at once anyway. Only
+    whole days are cached, not resumed passes or days still being written.
+    Entries of the RATES reader are kept per threshold. stats and reader are
+    passed on to run_rates(), a hit sets stats['cached'] to True.
+    """
+    key = None
+    start = args[3] if len(args) > 3 else 0
+    if cache is not None and not start:
+        threshold = args[4] if reader == RATES and len(args) > 4 else None
+        #None when the day's raw files can't be found
+        key = cache.key(*args[:3], reader=reader, threshold=threshold)
+    if key is not None:
+        entry = cache.get(key)
+        if entry is not None:
+            if stats is not None:
+                stats['cached'] = True
+            return entry
+    result, errors = run_rates(*args, check=check, emit=emit, stats=stats, reader=reader)
+    if key is not None and result.done == DAY:
+        cache.put(key, (result, errors))
+    return result, errors
+
+
+def _worker_loop(task_q, result_q, cache, buffers, generation, slots, slot, profile=None,
+                 reader=RATES):
+    """body of a worker process, runs work units until a None sentinel is received
+
+    Each unit sends an (EVENT, key, event, None) message per event as it is
+    found, then a (DONE, key, packed, errors) message. While a unit runs its key
+    is in slots[slot], so the pool knows which unit a worker that died was on. Summaries are written to
+    a buffer file in buffers, so only their descriptor goes back through
+    result_q, carrying the unit's timings as packed.stats. A unit stops early
+    once generation moves past the one it was queued in. If profile is a
+    directory, each unit is run under cProfile and its profile saved there as
+    <box>_<day>_<pid>.prof.
+    """
+    #import once per worker instead of once per work unit, failures are reported by run_rates()
+    if reader == RATES:
+        try:
+            import plot_hists_gui3
+        except ImportError:
+            pass
+    while True:
+        task = task_q.get()
+        if task is None:
+            return
+        key, gen, args, queued = task
+        slots[slot] = key
+        stats = {'pid': os.getpid(), 'wait': time() - queued}
+        def check():
+            if generation.value != gen:
+                raise Cancelled
+        def emit(event):
+            result_q.put((EVENT, key, event, None))
+        profiler = cProfile.Profile() if profile is not None else None
+        try:
+            check()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                result, errors = run_cached(cache, args, check, emit, stats, reader)
+                began = time()
+                packed = pack(result, buffers, key)
+                stats['pack'] = time() - began
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    profiler.dump_stats(os.path.join(profile, '%s_%s_%d.prof' %
+                                                     (args[0], args[1], os.getpid())))
+            packed.stats = stats
+            stats['sent'] = time()
+            result_q.put((DONE, key, packed, errors))
+        except Cancelled:
+            result_q.put((DONE, key, -1, []))
+        except Exception as inst:
+            result_q.put((DONE, key, -1, [_picklable(inst)]))
+        slots[slot] = -1
+
+
+class WorkerPool(object):
+
+    """A fixed number of worker processes that are reused across runs.
+
+    Work units are queued with submit() and handed to the workers as they
+    become idle, lowest priority first and in submit order among equals;
+    reprioritize() reorders the ones still queued. Events are passed to a unit's stream callback as they are
+    found and the finished unit to its callback, both from the pool's
+    collector thread. If a ResultCache is given, workers answer from it when
+    they can. Results come back through memory mapped buffer files (see
+    sharedbuf), which the GUI should release with sweep() between runs, with
+    the unit's timings as their stats. spawn is how long starting the worker
+    processes took. profile, a directory, turns on cProfile in the workers.
+    reader, one of READERS, is what the workers summarize days with. A worker
+    that dies (killed for memory, a crash in rates()) is replaced, and the unit
+    it was running finishes with a RatesError.
+    """
+
+    def __init__(self, size=None, cache=None, grace=2.0, profile=None, reader=RATES):
+        self.size = size or mp.cpu_count()
+        self.cache = cache
+        self.grace = grace
+        self.profile = profile
+        self.reader = reader
+        self.generation = mp.Value('i', 0)
+        self.pending = []       #heap of (resumed first, priority, key, task)
+        self.running = {}
+        self.slots = mp.Array('l', [-1] * self.size, lock=False)    #unit of each worker
+        self.closing = False
+        self.callbacks = {}
+        self.lock = threading.Lock()
+        self._next_key = 0
+        self.buffers = tempfile.mkdtemp(prefix='tetra_buffers_')
+        self.processes = []
+        self._start()
+
+    def _start(self):
+        #fresh queues each time, a terminated worker can leave the old ones unusable
+        began = time()
+        self.task_q = mp.Queue()
+        self.result_q = mp.Queue()
+        for slot in range(self.size):
+            self.slots[slot] = -1
+            self.processes.append(self._spawn(slot))
+        self.spawn = time() - began
+        self.collector = threading.Thread(target=self._collect, args=(self.result_q,))
+        self.collector.daemon = True
+        self.collector.start()
+
+    def _spawn(self, slot):
+        p = mp.Process(target=_worker_loop, args=(self.task_q, self.result_q, self.cache,
+                                                  self.buffers, self.generation, self.slots, slot,
+                                                  self.profile, self.reader))
+        p.daemon = True
+        p.start()
+        return p
+
+    def submit(self, args, callback, stream=None, priority=0):
+        """queues run_rates(*args), args being (name, day, path), (name, day, path, start)
+        or (name, day, path, start, threshold)
+
+        stream(event) is called for each event as it is found and
+        callback(summary, errors) when the unit finishes. Units with a lower
+        priority (any value that sorts, a tuple say) are started first.
+        """
+        with self.lock:
+            key = self._next_key
+            self._next_key += 1
+            self.callbacks[key] = callback, stream
+            task = key, self.generation.value, args, time()
+            heapq.heappush(self.pending, (1, priority, key, task))
+            self._feed()
+        return key
+
+    def reprioritize(self, priority):
+        """sets the priority of every queued unit to priority(args)"""
+        with self.lock:
+            #resumed units stay at the front
+            self.pending = [(first, priority(task[2]) if first else old, key, task)
+                            for first, old, key, task in self.pending]
+            heapq.heapify(self.pending)
+
+    def _feed(self):
+        #only hand out as many units as there are idle workers, the rest wait here
+        while self.pending and len(self.running) < self.size:
+            task = heapq.heappop(self.pending)[-1]
+            self.running[task[0]] = task
+            self.task_q.put(task)
+
+    def _collect(self, result_q):
+        checked = time()
+        while True:
+            if time() - checked > POLL:
+                self._check_workers(result_q)
+                checked = time()
+            try:
+                msg = result_q.get(timeout=POLL)
+            except Empty:
+                continue
+            if msg is None:
+                return
+            kind, key, packed, errors = msg
+            if kind == EVENT:
+                with self.lock:
+                    callback, stream = self.callbacks.get(key, (None, None))
+                if stream is not None:
+                    try:
+                        stream(packed)
+                    except Exception:
+                        pass
+                continue
+            with self.lock:
+                if self.running.pop(key, None) is None:
+                    #left over from workers replaced by _reap() or _check_workers()
+                    continue
+                callback, stream = self.callbacks.pop(key, (None, None))
+                self._feed()
+            if callback is None:
+                continue
+            result = -1
+            if packed != -1:
+                received = time()
+                try:
+                    result = unpack(packed)
+                    result.stats = packed.stats
+                    result.stats['pipe'] = received - result.stats.pop('sent')
+                    result.stats['unpack'] = time() - received
+                except Exception as inst:
+                    errors = errors + [inst]
+            try:
+                callback(result, errors)
+            except Exception:
+                #a failing callback must not stop the collector
+                pass
+
+    def _check_workers(self, result_q):
+        """replaces workers that died, the units they were running finish with a RatesError"""
+        lost = []
+        with self.lock:
+            if self.closing or result_q is not self.result_q:
+                #closed, or replaced by _reap() with its own collector
+                return
+            for slot, p in enumerate(self.processes):
+                if p.is_alive():
+                    continue
+                key, self.slots[slot] = self.slots[slot], -1
+                if self.running.pop(key, None) is not None:
+                    error = RatesError('worker %d stopped with exit code %s' % (p.pid, p.exitcode))
+                    lost.append((self.callbacks.pop(key, (None, None))[0], error))
+                self.processes[slot] = self._spawn(slot)
+            if lost:
+                self._feed()
+        for callback, error in lost:
+            if callback is None:
+                continue
+            try:
+                callback(-1, [error])
+            except Exception:
+                pass
+
+    def cancel(self):
+        """drops all queued units and stops the running ones
+
+        Running units stop at their next file or chunk boundary. Workers still busy
+        with a cancelled unit after grace seconds are terminated and replaced.
+        """
+        with self.lock:
+            del self.pending[:]
+            self.callbacks.clear()
+            self.generation.value += 1
+            if not self.running:
+                return
+        reaper = threading.Timer(self.grace, self._reap)
+        reaper.daemon = True
+        reaper.start()
+
+    def _reap(self):
+        with self.lock:
+            gen = self.generation.value
+            if all(task[1] == gen for task in self.running.values()):
+                return
+            old_q = self.result_q
+            for p in self.processes:
+                p.terminate()
+            for p in self.processes:
+                p.join()
+            self.processes = []
+            #units of the current run that were in flight go back to the front of the queue
+            for key in self.running:
+                if self.running[key][1] == gen:
+                    heapq.heappush(self.pending, (0, 0, key, self.running[key]))
+            self.running = {}
+            self._start()
+            self._feed()
+        old_q.put(None)
+
+    def sweep(self):
+        """removes buffer files of results that are no longer in use"""
+        sweep(self.buffers)
+
+    def close(self):
+        """stops the workers and the collector thread"""
+        with self.lock:
+            del self.pending[:]
+            self.callbacks.clear()
+            self.generation.value += 1
+            self.closing = True
+        for p in self.processes:
+            self.task_q.put(None)
+        self.result_q.put(None)
+        for p in self.processes:
+            p.join(1)
+            if p.is_alive():
+                p.terminate()
+        self.processes = []
+        shutil.rmtree(self.buffers, ignore_errors=True)